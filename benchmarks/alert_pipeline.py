@@ -0,0 +1,169 @@
+"""Load benchmark for the alert pipeline (check_alerts + mail outbox).
+
+Starts a fake CoinGecko server and a fake SMTP sink, seeds a throwaway
+SQLite database with N users/alerts, replays a synthetic price path
+through check_alerts and prints the results as JSON:
+
+    python benchmarks/alert_pipeline.py --alerts 100000 --ticks 50 --output bench.json
+"""
+import os, sys
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'web_app'))
+
+import argparse
+import json
+import logging
+import random
+import tempfile
+import threading
+import time
+
+import config
+from fakes import FakePriceServer, FakeSMTPSink, git_commit, peak_rss_mb, percentiles
+
+
+def price_path(coins, ticks, start=100.0, vol=0.02, seed=0):
+    """Geometric random walk per coin: [{coin: price}, ...]."""
+    rng = random.Random(seed)
+    prices = {c: start for c in coins}
+    path = []
+    for _ in range(ticks):
+        prices = {c: p * (1 + rng.gauss(0, vol)) for c, p in prices.items()}
+        path.append(dict(prices))
+    return path
+
+
+def configure(price_server):
+    """Point the shared price client at the stand-in; must run before
+    price_client is imported."""
+    config.COINGECKO_API_URL = price_server.url
+    config.PRICE_CACHE_TTL = 0
+
+
+def app_config(db_path, smtp_sink):
+    """create_app() overrides; ticks are driven by hand, so no scheduler."""
+    return {
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}",
+        "MAIL_SERVER": smtp_sink.host,
+        "MAIL_PORT": smtp_sink.port,
+        "MAIL_USERNAME": None,
+        "MAIL_PASSWORD": None,
+        "MAIL_USE_TLS": False,
+        "MQTT_ALERTS_ENABLED": False,
+        "SCHEDULER_ENABLED": False,
+        "SCHEDULER_COORDINATION": None,
+    }
+
+
+def seed(app_module, application, users, alerts, coins, start=100.0, spread=0.5, seed=0, chunk=50_000):
+    from sqlalchemy import insert
+    db, User, Alert = app_module.db, app_module.User, app_module.Alert
+    rng = random.Random(seed)
+    t0 = time.perf_counter()
+    with application.app_context():
+        db.session.execute(insert(User), [
+            {"email": f"user{i}@bench.local", "password": "x", "confirmed": True}
+            for i in range(users)])
+        for lo in range(0, alerts, chunk):
+            db.session.execute(insert(Alert), [
+                {"user_id": rng.randrange(users) + 1,
+                 "coin": rng.choice(coins),
+                 "threshold": start * (1 + rng.uniform(-spread, spread)),
+                 "direction": rng.choice(("above", "below")),
+                 "sent": False}
+                for _ in range(lo, min(alerts, lo + chunk))])
+        db.session.commit()
+    return time.perf_counter() - t0
+
+
+def run(args):
+    coins = config.COIN_LIST
+    prices = FakePriceServer(config.VS_CURRENCY).start()
+    smtp = FakeSMTPSink().start()
+    prices.prices = {c: 100.0 for c in coins}
+    tmp = tempfile.TemporaryDirectory()
+    configure(prices)
+
+    t0 = time.perf_counter()
+    import app as app_module
+    import_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    application = app_module.create_app(app_config(os.path.join(tmp.name, "bench.db"), smtp))
+    create_s = time.perf_counter() - t0
+    with application.app_context():
+        app_module.upgrade_schema()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    # Seed alerts so that a `spread` move triggers a fraction of them
+    seed_s = seed(app_module, application, args.users, args.alerts, coins, spread=args.spread)
+
+    # Take on the alert role: coordinator plus a full index build
+    t0 = time.perf_counter()
+    app_module.init_alerts(application)
+    rebuild_s = time.perf_counter() - t0
+
+    # Queries issued by check_alerts itself vs. by outbox delivery callbacks
+    from sqlalchemy import event
+    main_thread = threading.get_ident()
+    queries = {"tick": 0, "delivery": 0}
+    def count_query(*_):
+        queries["tick" if threading.get_ident() == main_thread else "delivery"] += 1
+    with application.app_context():
+        engine = app_module.db.engine
+    event.listen(engine, "before_cursor_execute", count_query)
+
+    tick_ms, tick_queries = [], []
+    for tick_prices in price_path(coins, args.ticks, vol=args.vol):
+        prices.prices = tick_prices
+        before = queries["tick"]
+        t0 = time.perf_counter()
+        app_module.check_alerts(application)
+        tick_ms.append((time.perf_counter() - t0) * 1000)
+        tick_queries.append(queries["tick"] - before)
+
+    # Emails go out asynchronously; wait for the outbox to drain
+    triggered = args.alerts - len(app_module.alert_index)
+    deadline = time.monotonic() + args.drain_timeout
+    while smtp.count() < triggered and time.monotonic() < deadline:
+        time.sleep(0.05)
+    received = [t for t, _ in smtp.received]
+    span = (received[-1] - received[0]) if len(received) > 1 else 0.0
+
+    return {
+        "commit": git_commit(),
+        "params": {"users": args.users, "alerts": args.alerts, "ticks": args.ticks,
+                   "coins": coins, "vol": args.vol, "spread": args.spread},
+        "startup_s": {"import": import_s, "create_app": create_s, "seed": seed_s, "index_rebuild": rebuild_s},
+        "tick_latency_ms": percentiles(tick_ms),
+        "db_queries": {"total": sum(tick_queries), "per_tick": percentiles(tick_queries),
+                       "delivery_callbacks": queries["delivery"]},
+        "upstream_requests": prices.requests,
+        "emails": {"triggered": triggered, "delivered": smtp.count(),
+                   "smtp_connections": smtp.connections,
+                   "per_second": (len(received) - 1) / span if span > 0 else None},
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--alerts", type=int, default=10_000, help="alerts to seed (1k .. 1M)")
+    ap.add_argument("--users", type=int, default=1_000)
+    ap.add_argument("--ticks", type=int, default=30)
+    ap.add_argument("--vol", type=float, default=0.02, help="per-tick price volatility")
+    ap.add_argument("--spread", type=float, default=0.5, help="thresholds within +/- spread of the start price")
+    ap.add_argument("--drain-timeout", type=float, default=60.0)
+    ap.add_argument("--output", help="write JSON here instead of stdout")
+    args = ap.parse_args()
+
+    result = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(result + "\n")
+    else:
+        print(result)
+
+
+if __name__ == "__main__":
+    main()
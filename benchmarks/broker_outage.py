@@ -0,0 +1,207 @@
+"""Broker outage benchmark for the collector's replay buffer.
+
+Runs the real Collector against a fake CoinGecko server and a fake MQTT
+broker, kills the broker for --outage seconds, restarts it and reports how
+the buffer grew, how long the backlog took to replay, the peak rate the
+broker saw while catching up and whether every coin's messages arrived
+complete and in timestamp order, as JSON:
+
+    python benchmarks/broker_outage.py --coins 50 --outage 30 --output outage.json
+"""
+import os, sys
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'pi_collector'))
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import random
+import tempfile
+import threading
+import time
+
+import config
+from fakes import FakePriceServer, FakeMQTTBroker, git_commit, rss_mb
+
+
+def wait_for(predicate, timeout, step=0.05):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(step)
+    return predicate()
+
+
+def check_delivery(received, topic_prefix, sent):
+    """Compare what the broker got on the per-coin topics with what was
+    published: missing updates, duplicates and per-coin reorderings."""
+    seen, last_ts = {}, {}
+    duplicates = reordered = 0
+    for _, topic, payload in received:
+        if not topic.startswith(topic_prefix + "/"):
+            continue
+        coin = topic.rsplit("/", 1)[-1]
+        data = json.loads(payload)
+        ts = data["timestamp"]
+        key = (coin, ts, data["price"])  # ticks under 1s apart share a timestamp
+        if key in seen:
+            duplicates += 1  # at-least-once: a batch re-sent after a failure
+            continue
+        seen[key] = True
+        if ts < last_ts.get(coin, ts):
+            reordered += 1
+        last_ts[coin] = ts
+    return {"published": len(sent), "missing": len(sent - seen.keys()),
+            "duplicates": duplicates, "reordered": reordered}
+
+
+def run(args):
+    coins = [f"coin{i}" for i in range(args.coins)]
+    rng = random.Random(0)
+    prices = FakePriceServer(config.VS_CURRENCY).start()
+    prices.prices = {c: 100.0 for c in coins}
+    broker = FakeMQTTBroker().start()
+    tmp = tempfile.TemporaryDirectory()
+
+    # Point the shared price client at the stand-in before it is imported
+    config.COINGECKO_API_URL = prices.url
+    config.PRICE_CACHE_TTL = 0
+    from collector import Collector
+    from mqtt_client import new_client
+    from publisher import PricePublisher
+    from replay_buffer import ReplayBuffer
+    from tick_store import TickStore
+
+    client = new_client("bench-collector")
+    client.max_queued_messages_set(config.MQTT_MAX_QUEUED)
+    client.reconnect_delay_set(min_delay=1, max_delay=1)
+    client.connect_async(broker.host, broker.port)
+    client.loop_start()
+    wait_for(client.is_connected, 10)
+
+    buffer = ReplayBuffer(os.path.join(tmp.name, "replay"), max_bytes=args.buffer_mb * 1024 * 1024,
+                          segment_bytes=64 * 1024)
+    publisher = PricePublisher(client, deadband=0.0, buffer=buffer)
+    store = TickStore(os.path.join(tmp.name, "ticks"))
+    collector = Collector(coins, config.VS_CURRENCY, publisher, store, interval=args.interval,
+                          replay_rate=args.replay_rate, replay_batch=args.replay_batch)
+
+    # Record what the collector publishes; move every price each tick so the
+    # deadband never hides an update
+    sent = set()
+    publish_tick = publisher.publish_tick
+    def recording_publish_tick(tick_prices, ts):
+        published = publish_tick(tick_prices, ts)
+        sent.update((coin, ts, tick_prices[coin]) for coin in published)
+        return published
+    publisher.publish_tick = recording_publish_tick
+    def move_prices():
+        prices.prices = {c: p * (1 + rng.gauss(0, 0.01)) for c, p in prices.prices.items()}
+    fetch_and_publish = collector.fetch_and_publish
+    async def moving_fetch_and_publish(chunk, sem, ts):
+        move_prices()
+        await fetch_and_publish(chunk, sem, ts)
+    collector.fetch_and_publish = moving_fetch_and_publish
+
+    loop = asyncio.new_event_loop()
+    def run_collector():
+        with contextlib.redirect_stdout(io.StringIO()):
+            try:
+                loop.run_until_complete(collector.run())
+            except asyncio.CancelledError:
+                pass
+    runner = threading.Thread(target=run_collector, daemon=True)
+    runner.start()
+
+    time.sleep(args.warmup)
+    rss_before = rss_mb()
+
+    # ---- outage ----
+    broker.stop()
+    outage_started = time.monotonic()
+    wait_for(lambda: not client.is_connected(), 5)
+    samples = []
+    while time.monotonic() - outage_started < args.outage:
+        samples.append({"t": round(time.monotonic() - outage_started, 2),
+                        "buffer_bytes": buffer.size_bytes(), "rss_mb": rss_mb()})
+        time.sleep(args.outage / 20)
+    buffered_bytes = buffer.size_bytes()
+
+    # ---- recovery ----
+    restarted = time.monotonic()
+    broker.start()
+    reconnected = wait_for(client.is_connected, 30)
+    reconnect_s = time.monotonic() - restarted
+    drained = wait_for(lambda: not buffer.backlog(), args.timeout)
+    replay_s = time.monotonic() - restarted
+    time.sleep(args.interval * 2)  # let the first live ticks after catch-up land
+
+    for task in asyncio.all_tasks(loop):
+        loop.call_soon_threadsafe(task.cancel)
+    runner.join(5)
+    client.disconnect()
+    client.loop_stop()
+    store.close()
+    buffer.close()
+    broker.stop()
+    prices.stop()
+
+    # Broker-side inbound rate after restart, in 1s windows
+    after = [t - restarted for t, _, _ in broker.received if t >= restarted]
+    windows = {}
+    for t in after:
+        windows[int(t)] = windows.get(int(t), 0) + 1
+
+    result = {
+        "commit": git_commit(),
+        "params": vars(args),
+        "outage": {
+            "samples": samples,
+            "buffer_bytes": buffered_bytes,
+            "rss_mb_before": rss_before,
+            "rss_mb_peak": max((s["rss_mb"] or 0) for s in samples) if samples else None,
+            "dropped_segments": buffer.dropped_segments,
+        },
+        "recovery": {
+            "reconnected": reconnected,
+            "reconnect_s": reconnect_s,
+            "drained": drained,
+            "replay_s": replay_s,
+            # The backlog only shrinks while replay_rate exceeds this
+            "live_msgs_per_s": args.coins / args.interval,
+            "messages_after_restart": len(after),
+            "peak_msgs_per_s": max(windows.values()) if windows else 0,
+        },
+        "delivery": check_delivery(broker.received, config.MQTT_TOPIC_PREFIX, sent),
+    }
+    tmp.cleanup()
+    return result
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--coins", type=int, default=50)
+    ap.add_argument("--interval", type=float, default=0.5, help="collector tick interval (s)")
+    ap.add_argument("--warmup", type=float, default=3.0)
+    ap.add_argument("--outage", type=float, default=10.0, help="seconds the broker is down")
+    ap.add_argument("--replay-rate", type=float, default=config.REPLAY_RATE)
+    ap.add_argument("--replay-batch", type=int, default=config.REPLAY_BATCH)
+    ap.add_argument("--buffer-mb", type=float, default=config.REPLAY_BUFFER_MAX_BYTES / 1024 / 1024)
+    ap.add_argument("--timeout", type=float, default=120.0, help="give up waiting for the replay")
+    ap.add_argument("--output", help="write JSON here instead of stdout")
+    args = ap.parse_args()
+
+    result = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(result + "\n")
+    else:
+        print(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+# fakes.py
+# Local stand-ins for the external services the project talks to, so
+# benchmarks never touch the real CoinGecko API or a real mail server,
+# plus the reporting helpers the benchmark scripts share.
+import json
+import os
+import resource
+import socket
+import socketserver
+import statistics
+import struct
+import subprocess
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+# ---- reporting ----
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def percentiles(values):
+    if not values:
+        return {}
+    ordered = sorted(values)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {"p50": pick(0.50), "p90": pick(0.90), "p99": pick(0.99),
+            "max": ordered[-1], "mean": statistics.fmean(ordered)}
+
+
+def peak_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+# ---- services ----
+
+
+class FakePriceServer:
+    """Serves /simple/price from an in-memory {coin: price} map."""
+
+    def __init__(self, vs_currency="usd", host="127.0.0.1", port=0):
+        self.vs_currency = vs_currency
+        self.prices = {}
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests += 1
+                url = urlparse(self.path)
+                if not url.path.endswith("/simple/price"):
+                    self.send_error(404)
+                    return
+                ids = parse_qs(url.query).get("ids", [""])[0].split(",")
+                body = json.dumps({c: {server.vs_currency: server.prices[c]}
+                                   for c in ids if c in server.prices}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self.url = f"http://{host}:{self._httpd.server_port}"
+
+    def start(self):
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+
+
+class FakeSMTPSink:
+    """Minimal SMTP server that accepts and counts every message.
+
+    Speaks just enough of RFC 5321 (EHLO/HELO, MAIL, RCPT, DATA, RSET,
+    NOOP, QUIT) for smtplib; no STARTTLS or AUTH.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.received = []    # (monotonic time, recipients)
+        self.connections = 0
+        self._lock = threading.Lock()
+        sink = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line):
+                self.wfile.write(line.encode() + b"\r\n")
+
+            def handle(self):
+                with sink._lock:
+                    sink.connections += 1
+                self.reply("220 fake-smtp ready")
+                rcpts = []
+                while True:
+                    line = self.rfile.readline()
+                    if not line:
+                        return
+                    cmd = line.decode(errors="replace").strip().upper()
+                    if cmd.startswith(("EHLO", "HELO")):
+                        self.reply("250 fake-smtp")
+                    elif cmd.startswith("MAIL FROM"):
+                        rcpts = []
+                        self.reply("250 OK")
+                    elif cmd.startswith("RCPT TO"):
+                        rcpts.append(cmd[8:].strip(" <>").lower())
+                        self.reply("250 OK")
+                    elif cmd == "DATA":
+                        self.reply("354 End data with <CR><LF>.<CR><LF>")
+                        while self.rfile.readline() not in (b".\r\n", b".\n", b""):
+                            pass
+                        with sink._lock:
+                            sink.received.append((time.monotonic(), rcpts))
+                        self.reply("250 OK queued")
+                    elif cmd == "QUIT":
+                        self.reply("221 Bye")
+                        return
+                    else:  # RSET, NOOP and anything else
+                        self.reply("250 OK")
+
+        class Server(socketserver.ThreadingTCPServer):
+            daemon_threads = True
+            allow_reuse_address = True
+
+        self._server = Server((host, port), Handler)
+        self.host, self.port = self._server.server_address
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+
+    def count(self):
+        with self._lock:
+            return len(self.received)
+
+
+def mqtt_packet(header, body=b""):
+    """One MQTT control packet: fixed header byte, remaining length, body."""
+    length, encoded = len(body), bytearray()
+    while True:
+        byte, length = length & 0x7F, length >> 7
+        encoded.append(byte | (0x80 if length else 0))
+        if not length:
+            break
+    return bytes([header]) + bytes(encoded) + body
+
+
+def _topic_matches(pattern, topic):
+    pat, parts = pattern.split("/"), topic.split("/")
+    for i, p in enumerate(pat):
+        if p == "#":
+            return True
+        if i >= len(parts) or (p != "+" and p != parts[i]):
+            return False
+    return len(pat) == len(parts)
+
+
+class FakeMQTTBroker:
+    """Minimal MQTT 3.1.1 broker for paho clients.
+
+    Handles CONNECT, PUBLISH at QoS 0/1/2 in both directions, SUBSCRIBE
+    with + and # wildcards, retained messages, UNSUBSCRIBE, PINGREQ and
+    DISCONNECT. Sessions are always clean and nothing is persisted.
+    stop() drops every connection, like killing the broker; start() again
+    listens on the same port.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.received = []    # (monotonic time, topic, payload) of every PUBLISH
+        self.retained = {}
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._sessions = set()
+        self._server = None
+        self.host, self.port = host, port
+
+    def start(self):
+        broker = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                session = _MQTTSession(broker, self.request)
+                with broker._lock:
+                    broker.connections += 1
+                    broker._sessions.add(session)
+                try:
+                    session.run()
+                except (OSError, ValueError):
+                    pass
+                finally:
+                    with broker._lock:
+                        broker._sessions.discard(session)
+
+        class Server(socketserver.ThreadingTCPServer):
+            daemon_threads = True
+            allow_reuse_address = True
+
+        self._server = Server((self.host, self.port), Handler)
+        self.host, self.port = self._server.server_address
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        with self._lock:
+            sessions = list(self._sessions)
+        for session in sessions:
+            session.close()
+
+    def count(self):
+        with self._lock:
+            return len(self.received)
+
+    def _route(self, topic, payload, qos, retain):
+        with self._lock:
+            self.received.append((time.monotonic(), topic, payload))
+            if retain:
+                if payload:
+                    self.retained[topic] = (payload, qos)
+                else:
+                    self.retained.pop(topic, None)
+            sessions = list(self._sessions)
+        for session in sessions:
+            granted = session.subscribed_qos(topic)
+            if granted is not None:
+                session.send_publish(topic, payload, min(qos, granted), retain=False)
+
+
+class _MQTTSession:
+    def __init__(self, broker, sock):
+        self.broker = broker
+        self.sock = sock
+        self.subscriptions = {}   # topic filter -> granted QoS
+        self._send_lock = threading.Lock()
+        self._next_id = 0
+
+    def close(self):
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+    def subscribed_qos(self, topic):
+        granted = [q for f, q in list(self.subscriptions.items()) if _topic_matches(f, topic)]
+        return max(granted) if granted else None
+
+    # ---- wire format ----
+
+    def _recv_exact(self, n):
+        buf = b""
+        while len(buf) < n:
+            chunk = self.sock.recv(n - len(buf))
+            if not chunk:
+                raise ConnectionError("client closed")
+            buf += chunk
+        return buf
+
+    def _read_packet(self):
+        header = self._recv_exact(1)[0]
+        length, shift = 0, 0
+        while True:
+            byte = self._recv_exact(1)[0]
+            length |= (byte & 0x7F) << shift
+            if not byte & 0x80:
+                break
+            shift += 7
+        return header, self._recv_exact(length) if length else b""
+
+    def _send(self, header, body=b""):
+        packet = mqtt_packet(header, body)
+        with self._send_lock:
+            self.sock.sendall(packet)
+
+    def send_publish(self, topic, payload, qos, retain):
+        body = struct.pack("!H", len(topic.encode())) + topic.encode()
+        if qos:
+            self._next_id = self._next_id % 65535 + 1
+            body += struct.pack("!H", self._next_id)
+        try:
+            self._send(0x30 | qos << 1 | int(retain), body + payload)
+        except OSError:
+            pass
+
+    # ---- protocol ----
+
+    def run(self):
+        header, _ = self._read_packet()
+        if header >> 4 != 1:
+            return
+        self._send(0x20, b"\x00\x00")    # CONNACK, accepted
+        while True:
+            header, body = self._read_packet()
+            kind = header >> 4
+            if kind == 3:      # PUBLISH
+                qos = (header >> 1) & 3
+                n = struct.unpack_from("!H", body)[0]
+                topic, pos = body[2:2 + n].decode(), 2 + n
+                if qos:
+                    packet_id = body[pos:pos + 2]
+                    pos += 2
+                    self._send(0x40 if qos == 1 else 0x50, packet_id)   # PUBACK / PUBREC
+                self.broker._route(topic, body[pos:], qos, bool(header & 1))
+            elif kind == 6:    # PUBREL
+                self._send(0x70, body[:2])                              # PUBCOMP
+            elif kind == 5:    # PUBREC for a QoS 2 delivery
+                self._send(0x62, body[:2])                              # PUBREL
+            elif kind == 8:    # SUBSCRIBE
+                pos, granted = 2, bytearray()
+                new = []
+                while pos < len(body):
+                    n = struct.unpack_from("!H", body, pos)[0]
+                    topic = body[pos + 2:pos + 2 + n].decode()
+                    qos = body[pos + 2 + n] & 3
+                    self.subscriptions[topic] = qos
+                    granted.append(qos)
+                    new.append(topic)
+                    pos += 3 + n
+                self._send(0x90, body[:2] + bytes(granted))            # SUBACK
+                with self.broker._lock:
+                    retained = list(self.broker.retained.items())
+                for topic, (payload, qos) in retained:
+                    for f in new:
+                        if _topic_matches(f, topic):
+                            self.send_publish(topic, payload, min(qos, self.subscriptions[f]), retain=True)
+                            break
+            elif kind == 10:   # UNSUBSCRIBE
+                pos = 2
+                while pos < len(body):
+                    n = struct.unpack_from("!H", body, pos)[0]
+                    self.subscriptions.pop(body[pos + 2:pos + 2 + n].decode(), None)
+                    pos += 2 + n
+                self._send(0xB0, body[:2])                              # UNSUBACK
+            elif kind == 12:   # PINGREQ
+                self._send(0xD0)
+            elif kind == 14:   # DISCONNECT
+                return
+            # PUBACK / PUBCOMP from subscribers need no reply
@@ -0,0 +1,77 @@
+"""Import-time benchmark for the web app and simulation entry points.
+
+Each target runs --repeat times in a fresh interpreter; reports the median
+wall time, the threads left running and which heavy dependencies were
+loaded, as JSON:
+
+    python benchmarks/import_time.py --repeat 10 --output imports.json
+"""
+import os, sys
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+import argparse
+import json
+import statistics
+import subprocess
+import tempfile
+
+from fakes import git_commit
+
+# name -> (directories put on sys.path, statement to time)
+TARGETS = {
+    "web_app.app import": (["web_app"], "import app"),
+    "web_app create_app()": (["web_app"], "import app; app.create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://'})"),
+    "simulation.simulate import": (["simulation"], "import simulate"),
+}
+HEAVY = ("requests", "pandas", "numpy", "matplotlib", "apscheduler", "paho", "flask_mail")
+
+CHILD = """
+import json, sys, threading, time
+sys.path[:0] = {paths!r}
+t0 = time.perf_counter()
+exec({stmt!r})
+elapsed = time.perf_counter() - t0
+print(json.dumps({{"s": elapsed, "threads": threading.active_count(),
+                  "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(paths, stmt, repeat, cwd, timeout=60):
+    code = CHILD.format(paths=[ROOT] + [os.path.join(ROOT, p) for p in paths], stmt=stmt, heavy=HEAVY)
+    runs = []
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, "-c", code], cwd=cwd, capture_output=True,
+                              text=True, timeout=timeout)
+        if proc.returncode != 0:
+            return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else proc.returncode}
+        runs.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    times = sorted(r["s"] * 1000 for r in runs)
+    return {"median_ms": statistics.median(times), "min_ms": times[0], "max_ms": times[-1],
+            "threads": runs[-1]["threads"], "loaded": runs[-1]["loaded"]}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--output", help="write JSON here instead of stdout")
+    args = ap.parse_args()
+
+    # Run children in a scratch directory so nothing they create lands in the tree
+    with tempfile.TemporaryDirectory() as cwd:
+        result = {
+            "commit": git_commit(),
+            "python": sys.version.split()[0],
+            "repeat": args.repeat,
+            "targets": {name: measure(paths, stmt, args.repeat, cwd)
+                        for name, (paths, stmt) in TARGETS.items()},
+        }
+    result = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(result + "\n")
+    else:
+        print(result)
+
+
+if __name__ == "__main__":
+    main()
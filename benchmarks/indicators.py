@@ -0,0 +1,129 @@
+"""Indicator benchmark: simulate.py reference functions vs. the shared graph.
+
+Builds a synthetic minute-level price series, runs generate_signals + the
+indicator lines plot() draws both ways and reports wall time, how many
+nodes the graph computed, the memory it holds and how many signals differ
+from the reference (expected: none), as JSON. Runs the --horizon windows as
+configured and once more with EMA/MACD-fast and SMA/BB windows equal, so
+the graph can share them. --start sets the price level; a low one such
+as 0.35 with --decimals 4 looks like a cardano-scale series, where tie
+handling matters most:
+
+    python benchmarks/indicators.py --minutes 1000000 --output indicators.json
+    python benchmarks/indicators.py --minutes 200000 --start 0.35 --decimals 4
+"""
+import os, sys
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'simulation'))
+
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from config import INDICATOR_WINDOWS
+import simulate
+from indicator_graph import graph_for
+from fakes import git_commit
+
+ALL = ["SMA", "EMA", "RSI", "MACD", "BB"]
+
+
+def price_frame(minutes, start=30000.0, decimals=None, seed=0):
+    rng = np.random.default_rng(seed)
+    price = start * np.exp(np.cumsum(rng.normal(0, 0.001, minutes)))
+    if decimals is not None:
+        price = price.round(decimals)  # quoted prices: many exact ties
+    index = pd.date_range("2024-01-01", periods=minutes, freq="min", name="date")
+    return pd.DataFrame({"price": price}, index=index)
+
+
+def reference(df, chosen, params):
+    """generate_signals + plot's lines with each indicator computed on its own."""
+    price = df["price"]
+    sig = pd.DataFrame(index=df.index)
+    if "SMA" in chosen:
+        sig["sma"] = price > simulate.sma(price, params["sma"])
+    if "EMA" in chosen:
+        sig["ema"] = price > simulate.ema(price, params["ema"])
+    if "RSI" in chosen:
+        sig["rsi"] = simulate.rsi(price, params["rsi"]) < 30
+    if "MACD" in chosen:
+        m, s = simulate.macd(price, params["macd_fast"], params["macd_slow"], params["macd_signal"])
+        sig["macd"] = m > s
+    if "BB" in chosen:
+        sig["bb"] = price < simulate.bollinger(price, params["bb_window"])[1]
+    sig["buy_votes"] = sig.sum(axis=1)
+    sig["sell_votes"] = len(chosen) - sig["buy_votes"]
+    sig["signal"] = sig["buy_votes"] > sig["sell_votes"]
+    lines = [simulate.sma(price, params["sma"]) if "SMA" in chosen else None,
+             simulate.ema(price, params["ema"]) if "EMA" in chosen else None]
+    return sig, lines
+
+
+def graph(df, chosen, params):
+    sig = simulate.generate_signals(df, chosen, params)
+    g = graph_for(df)
+    g.evaluate(g.indicators(chosen, params))   # what plot() asks for
+    return sig, g
+
+
+def timed(fn, repeat):
+    fn()  # warm-up
+    times, out = [], None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - t0)
+    return min(times) * 1000, out
+
+
+def compare(df, params, repeat):
+    ref_ms, (ref_sig, _) = timed(lambda: reference(df, ALL, params), repeat)
+    # A fresh DataFrame per run so every run starts with an empty memo
+    frames = [df.copy() for _ in range(repeat + 1)]
+    graph_ms, (sig, g) = timed(lambda: graph(frames.pop(), ALL, params), repeat)
+    return {
+        "params": params,
+        "reference_ms": ref_ms,
+        "graph_ms": graph_ms,
+        "graph_nodes_computed": g.computed,
+        "graph_mb": g.nbytes() / 1e6,
+        "signal_mismatches": {c: int((ref_sig[c] != sig[c]).sum()) for c in ref_sig.columns},
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--minutes", type=int, default=500_000)
+    ap.add_argument("--start", type=float, default=30000.0, help="first price")
+    ap.add_argument("--decimals", type=int, help="round prices to this many decimals")
+    ap.add_argument("--horizon", choices=sorted(INDICATOR_WINDOWS), default="short")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--output", help="write JSON here instead of stdout")
+    args = ap.parse_args()
+
+    params = INDICATOR_WINDOWS[args.horizon]
+    shared = dict(params, ema=params["macd_fast"], sma=params["bb_window"])
+    df = price_frame(args.minutes, args.start, args.decimals)
+    result = {
+        "commit": git_commit(),
+        "minutes": args.minutes,
+        "start": args.start,
+        "decimals": args.decimals,
+        "configured": compare(df, params, args.repeat),
+        "shared_windows": compare(df, shared, args.repeat),
+    }
+    result = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(result + "\n")
+    else:
+        print(result)
+
+
+if __name__ == "__main__":
+    main()
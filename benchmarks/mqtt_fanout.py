@@ -0,0 +1,327 @@
+"""MQTT fan-out benchmark: collector publish path -> broker -> display fleet.
+
+Publishes synthetic price ticks through PricePublisher (the collector's
+publish path) into a local broker while a fleet of simulated displays
+subscribes the way esp32_display/main.cpp does: one clean session per
+device, `<prefix>/#`, last price per coin. Each QoS level and payload
+format is one run; the report has publish-to-receive latency
+percentiles, loss, duplicates and broker throughput, as JSON:
+
+    python benchmarks/mqtt_fanout.py --subscribers 500 --qos 0 1 2 --formats json binary
+
+The broker is, in order of preference: --broker HOST:PORT, a mosquitto
+started with mqtt_server/mosquitto.conf (listener and persistence moved
+to a scratch directory), or the FakeMQTTBroker in a subprocess. The
+report names the one used; only mosquitto numbers say anything about
+production.
+"""
+import os, sys
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'pi_collector'))
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+import shutil
+import socket
+import struct
+import subprocess
+import tempfile
+import time
+import uuid
+
+from fakes import git_commit, mqtt_packet, percentiles
+from mqtt_client import new_client
+from publisher import PricePublisher, decode_binary
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(host, port, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Broker did not come up on {host}:{port}")
+
+
+# ---- broker ----
+
+def start_broker(args, tmp):
+    """(host, port, kind, process or None)"""
+    if args.broker:
+        host, port = args.broker.rsplit(":", 1)
+        return host, int(port), "external", None
+    port = free_port()
+    mosquitto = shutil.which("mosquitto")
+    if mosquitto and not args.fake_broker:
+        conf = os.path.join(tmp, "mosquitto.conf")
+        with open(os.path.join(ROOT, "mqtt_server", "mosquitto.conf")) as src, open(conf, "w") as dst:
+            for line in src:
+                if line.startswith("listener"):
+                    line = f"listener {port} 127.0.0.1\n"
+                elif line.startswith("persistence_location"):
+                    line = f"persistence_location {tmp}/\n"
+                dst.write(line)
+        proc = subprocess.Popen([mosquitto, "-c", conf], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        kind = "mosquitto"
+    else:
+        code = ("import sys; sys.path.insert(0, %r)\n"
+                "from fakes import FakeMQTTBroker\n"
+                "FakeMQTTBroker(port=%d).start(); sys.stdin.read()") % (os.path.dirname(__file__), port)
+        proc = subprocess.Popen([sys.executable, "-c", code], stdin=subprocess.PIPE)
+        kind = "fake"
+    wait_for_port("127.0.0.1", port)
+    return "127.0.0.1", port, kind, proc
+
+
+# ---- simulated displays (worker processes) ----
+
+class Display:
+    """One device: CONNECT, SUBSCRIBE <prefix>/#, then parse every price
+    into a last-price map, acking at the granted QoS."""
+
+    def __init__(self, client_id, fmt):
+        self.client_id = client_id
+        self.fmt = fmt
+        self.prices = {}
+        self.received = []    # (receive time, topic, payload)
+
+    async def read_packet(self, reader):
+        header = (await reader.readexactly(1))[0]
+        length, shift = 0, 0
+        while True:
+            byte = (await reader.readexactly(1))[0]
+            length |= (byte & 0x7F) << shift
+            if not byte & 0x80:
+                break
+            shift += 7
+        return header, await reader.readexactly(length) if length else b""
+
+    async def connect(self, host, port, topic, qos):
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+        cid = self.client_id.encode()
+        # MQTT 3.1.1, clean session, keepalive disabled
+        self.writer.write(mqtt_packet(0x10, b"\x00\x04MQTT\x04\x02\x00\x00" + struct.pack("!H", len(cid)) + cid))
+        await self.read_packet(self.reader)                                   # CONNACK
+        self.writer.write(mqtt_packet(0x82, struct.pack("!HH", 1, len(topic)) + topic.encode() + bytes([qos])))
+        await self.read_packet(self.reader)                                   # SUBACK
+
+    async def run(self):
+        try:
+            while True:
+                header, body = await self.read_packet(self.reader)
+                kind = header >> 4
+                if kind == 3:
+                    now = time.time()
+                    qos = (header >> 1) & 3
+                    n = struct.unpack_from("!H", body)[0]
+                    topic, pos = body[2:2 + n].decode(), 2 + n
+                    if qos:
+                        self.writer.write(mqtt_packet(0x40 if qos == 1 else 0x50, body[pos:pos + 2]))
+                        pos += 2
+                    payload = body[pos:]
+                    self.received.append((now, topic, payload))
+                    coin = topic[topic.rfind("/") + 1:]
+                    if self.fmt == "json":
+                        self.prices[coin] = json.loads(payload)["price"]
+                    else:
+                        self.prices[coin] = decode_binary(payload)[0]
+                elif kind == 6:   # PUBREL
+                    self.writer.write(mqtt_packet(0x70, body[:2]))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+
+def fleet_worker(conn, host, port, topic, qos, fmt, count, offset, connect_concurrency):
+    async def main():
+        loop = asyncio.get_running_loop()
+        displays = [Display(f"display-{offset + i}", fmt) for i in range(count)]
+        sem = asyncio.Semaphore(connect_concurrency)
+        async def connect(d):
+            async with sem:
+                await d.connect(host, port, topic, qos)
+        await asyncio.gather(*(connect(d) for d in displays))
+        tasks = [asyncio.create_task(d.run()) for d in displays]
+        commands = asyncio.Queue()
+        loop.add_reader(conn.fileno(), lambda: commands.put_nowait(conn.recv()))
+        conn.send("ready")
+        while True:
+            cmd = await commands.get()
+            if cmd == "count":
+                conn.send(sum(len(d.received) for d in displays))
+                continue
+            published = cmd   # {(topic, payload): publish time}
+            break
+        loop.remove_reader(conn.fileno())
+        for d in displays:
+            d.writer.close()
+        for t in tasks:
+            t.cancel()
+        latencies, delivered, duplicates, unknown = [], 0, 0, 0
+        for d in displays:
+            seen = set()
+            for t, tp, payload in d.received:
+                key = (tp, payload)
+                sent_at = published.get(key)
+                if sent_at is None:
+                    unknown += 1
+                    continue
+                if key in seen:
+                    duplicates += 1
+                    continue
+                seen.add(key)
+                delivered += 1
+                latencies.append((t - sent_at) * 1000)
+        last = max((d.received[-1][0] for d in displays if d.received), default=None)
+        conn.send({"delivered": delivered, "duplicates": duplicates, "unknown": unknown,
+                   "latencies_ms": latencies, "last_receive": last})
+    asyncio.run(main())
+
+
+# ---- one run ----
+
+def run_case(args, host, port, qos, fmt):
+    base = f"bench/{uuid.uuid4().hex[:8]}"
+    json_prefix, binary_prefix = f"{base}/crypto/price", f"{base}/crypto/bin"
+    topic = (json_prefix if fmt == "json" else binary_prefix) + "/#"
+
+    # Fleet, split across worker processes
+    procs = max(1, min(args.procs, args.subscribers))
+    workers = []
+    for w in range(procs):
+        n = args.subscribers // procs + (1 if w < args.subscribers % procs else 0)
+        parent, child = multiprocessing.Pipe()
+        p = multiprocessing.Process(target=fleet_worker, daemon=True,
+                                    args=(child, host, port, topic, qos, fmt, n, w * 100000, 50))
+        p.start()
+        workers.append((p, parent))
+    for _, c in workers:
+        if not c.poll(60) or c.recv() != "ready":
+            raise RuntimeError("Subscriber fleet failed to connect")
+
+    # Real publish path: paho client + PricePublisher, every coin every tick
+    client = new_client(f"bench-publisher-{uuid.uuid4().hex[:6]}")
+    client.max_inflight_messages_set(args.max_inflight)
+    client.connect(host, port)
+    client.loop_start()
+    published = {}
+    paho_publish = client.publish
+    def timed_publish(tp, payload=None, qos=0, retain=False, properties=None):
+        data = payload.encode() if isinstance(payload, str) else payload
+        published[(tp, data)] = time.time()
+        return paho_publish(tp, data, qos=qos, retain=retain)
+    client.publish = timed_publish
+    publisher = PricePublisher(client, topic_prefix=json_prefix, deadband=0.0, qos=qos,
+                               snapshot_topic=f"{base}/crypto/snapshot",
+                               binary_prefix=binary_prefix if fmt == "binary" else None)
+
+    rng = random.Random(qos)
+    coins = [f"coin{i}" for i in range(args.coins)]
+    prices = {c: 100.0 for c in coins}
+    infos = []
+    started = time.time()
+    for k in range(args.ticks):
+        prices = {c: p * (1 + rng.gauss(0, 0.01)) for c, p in prices.items()}
+        publisher.publish_tick(prices, int(time.time()))
+        if args.interval:
+            time.sleep(max(0.0, started + (k + 1) * args.interval - time.time()))
+    publish_s = time.time() - started
+
+    # Wait until deliveries stop growing
+    matched = sum(1 for tp, _ in published if tp.startswith(topic[:-1]))
+    expected = matched * args.subscribers
+    last_total, last_change = -1, time.monotonic()
+    while time.monotonic() - last_change < args.drain:
+        for _, c in workers:
+            c.send("count")
+        total = sum(c.recv() for _, c in workers)
+        if total >= expected:
+            break
+        if total != last_total:
+            last_total, last_change = total, time.monotonic()
+        time.sleep(0.1)
+
+    results = []
+    for _, c in workers:
+        c.send(published)
+        results.append(c.recv())
+    for p, _ in workers:
+        p.join(10)
+
+    # Clear the retained messages this run left on the broker
+    client.publish = paho_publish
+    for tp in {tp for tp, _ in published}:
+        client.publish(tp, b"", qos=qos, retain=True)
+    client.disconnect()
+    client.loop_stop()
+
+    delivered = sum(r["delivered"] for r in results)
+    latencies = [x for r in results for x in r["latencies_ms"]]
+    last = max((r["last_receive"] for r in results if r["last_receive"]), default=started)
+    span = last - started
+    return {
+        "qos": qos,
+        "format": fmt,
+        "published": len(published),
+        "published_per_s": len(published) / publish_s if publish_s > 0 else None,
+        "expected_deliveries": expected,
+        "delivered": delivered,
+        "loss_pct": 100.0 * (expected - delivered) / expected if expected else 0.0,
+        "duplicates": sum(r["duplicates"] for r in results),
+        "latency_ms": percentiles(latencies),
+        "deliveries_per_s": delivered / span if span > 0 else None,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--subscribers", type=int, default=200)
+    ap.add_argument("--coins", type=int, default=10)
+    ap.add_argument("--ticks", type=int, default=50)
+    ap.add_argument("--interval", type=float, default=0.1, help="seconds between ticks; 0 for flat out")
+    ap.add_argument("--qos", type=int, nargs="+", default=[0, 1], choices=[0, 1, 2])
+    ap.add_argument("--formats", nargs="+", default=["json", "binary"], choices=["json", "binary"])
+    ap.add_argument("--procs", type=int, default=min(4, os.cpu_count() or 1),
+                    help="processes the fleet is spread over")
+    ap.add_argument("--max-inflight", type=int, default=20, help="paho's in-flight window for QoS>0")
+    ap.add_argument("--drain", type=float, default=3.0, help="stop waiting after this long without deliveries")
+    ap.add_argument("--broker", metavar="HOST:PORT", help="use a running broker")
+    ap.add_argument("--fake-broker", action="store_true", help="use the fake broker even if mosquitto is installed")
+    ap.add_argument("--output", help="write JSON here instead of stdout")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        host, port, kind, proc = start_broker(args, tmp)
+        try:
+            runs = [run_case(args, host, port, q, f) for q in args.qos for f in args.formats]
+        finally:
+            if proc is not None:
+                proc.terminate()
+                proc.wait(10)
+
+    result = json.dumps({
+        "commit": git_commit(),
+        "broker": kind,
+        "params": {k: v for k, v in vars(args).items() if k != "output"},
+        "runs": runs,
+    }, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(result + "\n")
+    else:
+        print(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,10 +3,48 @@
 MQTT_BROKER       = "localhost"      # or your broker IP
 MQTT_PORT         = 1883
 MQTT_TOPIC_PREFIX = "crypto/price"  # final topic: crypto/price/<coin>
+MQTT_SIGNAL_TOPIC_PREFIX = "crypto/signal"  # live signals: crypto/signal/<coin>
+MQTT_SNAPSHOT_TOPIC = "crypto/snapshot"     # retained JSON of every coin's last price
+MQTT_BINARY_TOPIC_PREFIX = None             # e.g. "crypto/bin" to also publish 12-byte payloads
+MQTT_RETAIN       = True             # retain per-coin and snapshot messages for new subscribers
 
 COIN_LIST         = ["bitcoin", "ethereum", "cardano"]
 VS_CURRENCY       = "usd"
 PUBLISH_INTERVAL  = 10               # seconds between publishes
+PUBLISH_DEADBAND  = 0.0005           # publish a coin only after a >0.05% move...
+PUBLISH_HEARTBEAT = 60               # ...or when this many seconds have passed
+COLLECTOR_METRICS_PORT = 9100        # Prometheus /metrics for the collector; None to disable
+# While the broker is unreachable the collector appends ticks to an on-disk
+# buffer and replays them, oldest first, once it reconnects
+REPLAY_BUFFER_PATH      = "replay_buffer"     # None to disable
+REPLAY_BUFFER_MAX_BYTES = 64 * 1024 * 1024    # oldest ticks dropped beyond this
+REPLAY_SEGMENT_BYTES    = 1024 * 1024
+REPLAY_RATE             = 200                 # messages/s while catching up
+REPLAY_BATCH            = 50                  # messages per acknowledged batch
+MQTT_MAX_QUEUED         = 1000                # paho's in-memory queue; the rest goes to disk
+
+# ============ Price API (shared by collector, web app & simulation) ============
+COINGECKO_API_URL   = "https://api.coingecko.com/api/v3"
+PRICE_CACHE_TTL     = 5              # seconds; keep below PUBLISH_INTERVAL
+HISTORY_CACHE_TTL   = 300            # seconds, for market_chart responses
+PRICE_FETCH_TIMEOUT = 10             # seconds per HTTP request
+PRICE_FETCH_RETRIES = 4              # retries on 429/5xx before giving up
+PRICE_RETRY_AFTER_MAX = 120          # seconds; a longer Retry-After fails fast instead of sleeping
+PRICE_IDS_PER_REQUEST = 100          # COIN_LIST is split into requests of at most this many ids
+PRICE_FETCH_CONCURRENCY = 4          # concurrent upstream requests per collector tick
+
+# ============ Tick store (collector history) ============
+TICK_STORE_PATH      = "tick_data"   # one sub-directory per vs_currency
+TICK_STORE_RETENTION = {             # max age in seconds, None = keep forever
+    "raw": 7 * 86400,
+    "1m":  30 * 86400,
+    "1h":  365 * 86400,
+    "1d":  None,
+}
+# A tick is stamped when its fetch starts but stored when the fetch ends,
+# possibly after retries and a Retry-After cooldown; buckets are rolled
+# up only once they are this many seconds in the past
+TICK_STORE_COMPACT_GRACE = PRICE_RETRY_AFTER_MAX + PRICE_FETCH_TIMEOUT * (PRICE_FETCH_RETRIES + 1)
 
 # ============ Web app ============
 SECRET_KEY                = "change-this-to-a-secure-random-string"
@@ -20,7 +58,35 @@ MAIL_SERVER   = "localhost"
 MAIL_PORT     = 1025
 MAIL_USERNAME = None
 MAIL_PASSWORD = None
+MAIL_USE_TLS  = False
+MAIL_OUTBOX_WORKERS      = 2   # SMTP connections kept open by the outbox
+MAIL_OUTBOX_MAX_ATTEMPTS = 5   # sends retried with backoff before giving up
+APSCHEDULER_API_ENABLED = True
+
+# Evaluate alerts on each MQTT price message; the 60s scheduler job only
+# fetches prices itself when the feed has been silent for this long
+MQTT_ALERTS_ENABLED    = True
+ALERT_FEED_STALE_AFTER = 2 * PUBLISH_HEARTBEAT  # seconds
+
+# Run the alert scheduler inside every web worker created by create_app();
+# otherwise run it on its own with `flask --app app run-scheduler`
+SCHEDULER_ENABLED      = False
+# Which WSGI worker(s) evaluate alerts: None (single process), "sql" (leader
+# lease in the app database), "file" (flock on SCHEDULER_LOCK_FILE, one host
+# only) or "shard" (coins split across all live workers)
+SCHEDULER_COORDINATION = "sql"
+SCHEDULER_LEASE_TTL    = 60          # seconds before a dead leader/worker is replaced
+SCHEDULER_LOCK_FILE    = "scheduler.lock"
+ALERT_INDEX_RESYNC     = 600         # seconds between full alert index rebuilds
+# Request-path caches (per worker): logged-in users and rendered alert lists
+USER_CACHE_SIZE        = 10000
+USER_CACHE_TTL         = 300         # seconds
+ALERT_PAGE_CACHE_SIZE  = 2000
+ALERT_PAGE_CACHE_TTL   = 30          # seconds; bounds staleness across workers
+METRICS_ENABLED        = True        # expose Prometheus metrics at /metrics (per worker)
 # ============ Simulation defaults ============
+HISTORY_CACHE_PATH      = "history_cache"     # market_chart cache for simulate/backtest
+HISTORY_CACHE_MAX_BYTES = 256 * 1024 * 1024   # LRU-evicted beyond this
 INDICATOR_WINDOWS = {
     "short": {"sma": 10, "ema": 10, "rsi": 7, "macd_fast": 12, "macd_slow": 26, "macd_signal": 9, "bb_window": 20},
     "long":  {"sma": 50, "ema": 50, "rsi": 14, "macd_fast": 12, "macd_slow": 26, "macd_signal": 9, "bb_window": 20},
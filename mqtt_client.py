@@ -0,0 +1,12 @@
+# mqtt_client.py
+# paho-mqtt 1.x/2.x compatible client construction, shared by the
+# collector, the web app and the simulation services.
+import paho.mqtt.client as mqtt
+
+
+def new_client(client_id=""):
+    """paho Client using the 1.x callback signatures on either major version."""
+    try:
+        return mqtt.Client(mqtt.CallbackAPIVersion.VERSION1, client_id=client_id)
+    except AttributeError:
+        return mqtt.Client(client_id=client_id)
@@ -1,42 +1,152 @@
 import os, sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-import time, json
-import requests
-import paho.mqtt.client as mqtt
+import asyncio
+import math
+import time
 from config import (
     MQTT_BROKER, MQTT_PORT, MQTT_TOPIC_PREFIX,
-    COIN_LIST, VS_CURRENCY, PUBLISH_INTERVAL
+    COIN_LIST, VS_CURRENCY, PUBLISH_INTERVAL,
+    PRICE_IDS_PER_REQUEST, PRICE_FETCH_CONCURRENCY, COLLECTOR_METRICS_PORT,
+    REPLAY_BUFFER_PATH, REPLAY_BUFFER_MAX_BYTES, REPLAY_SEGMENT_BYTES,
+    REPLAY_RATE, REPLAY_BATCH, MQTT_MAX_QUEUED
 )
+import metrics
+from price_client import get_client
+from tick_store import open_store
+from mqtt_client import new_client
+from publisher import PricePublisher
+from replay_buffer import ReplayBuffer
+
+TICK_LAG_SECONDS = metrics.histogram('collector_tick_lag_seconds', 'How late each tick started')
+TICK_SECONDS = metrics.histogram('collector_tick_duration_seconds', 'Fetch-and-publish time per tick')
+TICKS_SKIPPED = metrics.counter('collector_ticks_skipped_total', 'Ticks skipped because the previous one overran')
+PRICES_FETCHED = metrics.counter('collector_prices_fetched_total', 'Coin prices received from the API')
 
 def fetch_prices(coins, vs_currency):
-    url = "https://api.coingecko.com/api/v3/simple/price"
-    params = {
-        "ids": ",".join(coins),
-        "vs_currencies": vs_currency
-    }
-    res = requests.get(url, params=params)
-    res.raise_for_status()
-    return res.json()  # e.g. {"bitcoin":{"usd":12345}, ...}
+    return get_client().simple_price(coins, vs_currency)  # e.g. {"bitcoin":{"usd":12345}, ...}
+
+def chunked(items, size):
+    return [items[i:i+size] for i in range(0, len(items), size)]
+
+class Collector:
+    """Fetch-and-publish loop on absolute deadlines.
+
+    Tick k starts at start + k * interval regardless of how long earlier
+    ticks took, so the period does not drift by the fetch latency. Each
+    tick splits the coin list into chunks of PRICE_IDS_PER_REQUEST ids,
+    fetches them concurrently (at most PRICE_FETCH_CONCURRENCY at a time)
+    and publishes each chunk as soon as its response arrives.
+
+    When the publisher has a replay buffer, a second loop drains it after
+    a broker outage in batches of `replay_batch`, at most `replay_rate`
+    messages per second, so subscribers are not flooded on reconnect.
+    """
+
+    def __init__(self, coins, vs_currency, publisher, store, interval=PUBLISH_INTERVAL,
+                 chunk_size=PRICE_IDS_PER_REQUEST, concurrency=PRICE_FETCH_CONCURRENCY,
+                 replay_rate=REPLAY_RATE, replay_batch=REPLAY_BATCH):
+        self.chunks = chunked(list(coins), chunk_size)
+        self.vs_currency = vs_currency
+        self.publisher = publisher
+        self.store = store
+        self.interval = interval
+        self.concurrency = concurrency
+        self.replay_rate = replay_rate
+        self.replay_batch = replay_batch
+        # Cadence stats: how late each tick started and how long it ran
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.last_duration = 0.0
+        self.ticks = 0
+        self.skipped_ticks = 0
+
+    async def fetch_and_publish(self, chunk, sem, ts):
+        async with sem:
+            data = await asyncio.to_thread(fetch_prices, chunk, self.vs_currency)
+        prices = {}
+        for coin, vals in data.items():
+            price = vals[self.vs_currency]
+            self.store.append(coin, ts, price)
+            prices[coin] = price
+        PRICES_FETCHED.inc(len(prices))
+        for coin in self.publisher.publish_tick(prices, ts):
+            print(f"Published {coin}@{prices[coin]} to {MQTT_TOPIC_PREFIX}/{coin}")
+
+    async def tick(self):
+        started = time.monotonic()
+        ts = int(time.time())
+        sem = asyncio.Semaphore(self.concurrency)
+        tasks = [asyncio.create_task(self.fetch_and_publish(c, sem, ts)) for c in self.chunks]
+        for fut in asyncio.as_completed(tasks):
+            try:
+                await fut
+            except Exception as e:
+                print("Error fetching/publishing:", e)
+        self.last_duration = time.monotonic() - started
+        TICK_SECONDS.observe(self.last_duration)
+
+    async def replay_loop(self):
+        while True:
+            try:
+                sent = await asyncio.to_thread(self.publisher.replay, self.replay_batch)
+            except Exception as e:
+                print("Error replaying buffered ticks:", e)
+                sent = 0
+            if sent:
+                print(f"Replayed {sent} buffered updates")
+            await asyncio.sleep(sent / self.replay_rate if sent else 1.0)
+
+    async def run(self):
+        if self.publisher.buffer is not None:
+            self._replay_task = asyncio.create_task(self.replay_loop())
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        k = 0
+        current = None
+        while True:
+            deadline = start + k * self.interval
+            await asyncio.sleep(max(0.0, deadline - loop.time()))
+            self.last_lag = loop.time() - deadline
+            self.max_lag = max(self.max_lag, self.last_lag)
+            TICK_LAG_SECONDS.observe(max(0.0, self.last_lag))
+
+            if current is not None and not current.done():
+                # Previous tick overran the whole interval; don't pile up
+                self.skipped_ticks += 1
+                TICKS_SKIPPED.inc()
+                print(f"Tick {k} skipped: previous tick still running")
+            else:
+                current = asyncio.create_task(self.tick())
+                self.ticks += 1
+                if self.last_lag > self.interval / 10:
+                    print(f"Tick {k} started {self.last_lag*1000:.0f} ms late")
+
+            # Next deadline on the grid, skipping any we already missed
+            k = max(k + 1, math.ceil((loop.time() - start) / self.interval))
 
 def main():
-    client = mqtt.Client()
-    client.connect(MQTT_BROKER, MQTT_PORT)
+    client = new_client("crypto-collector")
+    client.max_queued_messages_set(MQTT_MAX_QUEUED)
+    # Keep retrying in the background; ticks go to the replay buffer meanwhile
+    client.reconnect_delay_set(min_delay=1, max_delay=30)
+    client.connect_async(MQTT_BROKER, MQTT_PORT)
     client.loop_start()
 
-    while True:
-        try:
-            data = fetch_prices(COIN_LIST, VS_CURRENCY)
-            ts = int(time.time())
-            for coin, vals in data.items():
-                price = vals[VS_CURRENCY]
-                topic = f"{MQTT_TOPIC_PREFIX}/{coin}"
-                payload = json.dumps({"price": price, "timestamp": ts})
-                client.publish(topic, payload, qos=1)
-                print(f"Published {coin}@{price} to {topic}")
-        except Exception as e:
-            print("Error fetching/publishing:", e)
-        time.sleep(PUBLISH_INTERVAL)
+    if COLLECTOR_METRICS_PORT:
+        metrics.start_http_server(COLLECTOR_METRICS_PORT)
+
+    # Every tick is also kept locally; compaction builds 1m/1h/1d rollups
+    store = open_store(VS_CURRENCY)
+    store.start_compaction()
+    buffer = None
+    if REPLAY_BUFFER_PATH:
+        buffer = ReplayBuffer(REPLAY_BUFFER_PATH, max_bytes=REPLAY_BUFFER_MAX_BYTES,
+                              segment_bytes=REPLAY_SEGMENT_BYTES)
+    publisher = PricePublisher(client, buffer=buffer)
+
+    collector = Collector(COIN_LIST, VS_CURRENCY, publisher, store)
+    asyncio.run(collector.run())
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
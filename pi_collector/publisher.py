@@ -0,0 +1,160 @@
+import json
+import struct
+import time
+
+import metrics
+from config import (
+    MQTT_TOPIC_PREFIX, MQTT_SNAPSHOT_TOPIC, MQTT_BINARY_TOPIC_PREFIX,
+    PUBLISH_DEADBAND, PUBLISH_HEARTBEAT, MQTT_RETAIN
+)
+
+# Compact payload: little-endian float64 price + uint32 unix timestamp (12 bytes)
+BINARY_PAYLOAD = struct.Struct('<dI')
+
+PUBLISHES = metrics.counter('mqtt_publishes_total', 'Messages handed to the MQTT client', ['kind'])
+PUBLISH_FAILURES = metrics.counter('mqtt_publish_failures_total', 'Publishes the MQTT client rejected', ['kind'])
+DEADBAND_SKIPS = metrics.counter('mqtt_publish_skipped_total', 'Coin updates suppressed by the deadband')
+BUFFERED = metrics.counter('mqtt_ticks_buffered_total', 'Coin updates written to the replay buffer')
+REPLAYED = metrics.counter('mqtt_ticks_replayed_total', 'Buffered coin updates published after reconnecting')
+BUFFER_BYTES = metrics.gauge('mqtt_replay_buffer_bytes', 'Disk used by the replay buffer')
+BUFFER_DROPPED = metrics.gauge('mqtt_replay_buffer_dropped_segments', 'Oldest buffer segments dropped to stay under the size cap')
+
+# paho return codes: NO_CONN still queues QoS>0 messages for the next
+# connection; anything else means the message was not taken
+MQTT_ERR_SUCCESS = 0
+MQTT_ERR_NO_CONN = 4
+
+
+def encode_binary(price, ts):
+    return BINARY_PAYLOAD.pack(price, int(ts))
+
+
+def decode_binary(payload):
+    price, ts = BINARY_PAYLOAD.unpack(payload)
+    return price, ts
+
+
+class PricePublisher:
+    """Change-driven MQTT publishing for the collector.
+
+    A coin is published only when its price moved by more than `deadband`
+    (relative) since the last publish, or when `heartbeat` seconds have
+    passed. Per-coin JSON messages keep the format esp32_display expects
+    and are retained, as is one aggregated snapshot of every coin, so new
+    subscribers get current state straight away.
+
+    With a `buffer` (ReplayBuffer), updates that cannot be handed to the
+    client -- broker down, or paho's bounded queue full -- are written to
+    disk instead, and so is every update after them until replay() has
+    caught up, which keeps each coin's messages in timestamp order.
+    """
+
+    def __init__(self, client, topic_prefix=MQTT_TOPIC_PREFIX, deadband=PUBLISH_DEADBAND,
+                 heartbeat=PUBLISH_HEARTBEAT, qos=1, retain=MQTT_RETAIN,
+                 snapshot_topic=MQTT_SNAPSHOT_TOPIC, binary_prefix=MQTT_BINARY_TOPIC_PREFIX,
+                 buffer=None):
+        self.client = client
+        self.topic_prefix = topic_prefix
+        self.deadband = deadband
+        self.heartbeat = heartbeat
+        self.qos = qos
+        self.retain = retain
+        self.snapshot_topic = snapshot_topic
+        self.binary_prefix = binary_prefix
+        self.buffer = buffer
+        self._last = {}       # coin -> (price, monotonic time) of the last publish
+        self._snapshot = {}   # coin -> {"price": ..., "timestamp": ...}
+
+    def should_publish(self, coin, price, now):
+        last = self._last.get(coin)
+        if last is None:
+            return True
+        last_price, last_at = last
+        if now - last_at >= self.heartbeat:
+            return True
+        if last_price == 0:
+            return price != 0
+        return abs(price - last_price) / abs(last_price) > self.deadband
+
+    def publish_tick(self, prices, ts):
+        """Publish the coins of a {coin: price} tick that changed enough;
+        returns the list of coins published."""
+        now = time.monotonic()
+        published, backlog = [], []
+        offline = self.buffer is not None and (not self.client.is_connected() or self.buffer.backlog())
+        for coin, price in prices.items():
+            if not self.should_publish(coin, price, now):
+                DEADBAND_SKIPS.inc()
+                continue
+            self._last[coin] = (price, now)
+            published.append(coin)
+            if offline:
+                backlog.append((ts, coin, price))
+                continue
+            info = self.publish_coin(coin, price, ts)
+            if self.buffer is not None and info.rc not in (MQTT_ERR_SUCCESS, MQTT_ERR_NO_CONN):
+                backlog.append((ts, coin, price))
+                offline = True  # keep the rest of this tick behind it
+        if backlog:
+            self.buffer.append(backlog)
+            BUFFERED.inc(len(backlog))
+            self._buffer_stats()
+        elif published:
+            self.publish_snapshot(ts)
+        return published
+
+    def replay(self, batch_size=50, timeout=10.0):
+        """Publish the next batch of buffered updates, oldest first.
+
+        The batch is committed only once the broker has acknowledged all of
+        it; otherwise it is sent again by a later call (at-least-once).
+        Returns the number of updates replayed.
+        """
+        if self.buffer is None or not self.client.is_connected():
+            return 0
+        records, position = self.buffer.read(batch_size)
+        if not records:
+            return 0
+        deadline = time.monotonic() + timeout
+        infos = [self.publish_coin(coin, price, int(ts) if ts.is_integer() else ts)
+                 for ts, coin, price in records]
+        for info in infos:
+            if info.rc not in (MQTT_ERR_SUCCESS, MQTT_ERR_NO_CONN):
+                return 0
+            try:
+                info.wait_for_publish(max(0.0, deadline - time.monotonic()))
+            except (RuntimeError, ValueError):
+                return 0
+            if not info.is_published():
+                return 0
+        self.buffer.commit(position)
+        REPLAYED.inc(len(records))
+        self._buffer_stats()
+        if not self.buffer.backlog():
+            ts = records[-1][0]
+            self.publish_snapshot(int(ts) if ts.is_integer() else ts)
+        return len(records)
+
+    def publish_snapshot(self, ts):
+        if self.snapshot_topic and self._snapshot:
+            self._publish('snapshot', self.snapshot_topic,
+                          json.dumps({"timestamp": ts, "prices": self._snapshot}))
+
+    def publish_coin(self, coin, price, ts):
+        payload = json.dumps({"price": price, "timestamp": ts})
+        info = self._publish('json', f"{self.topic_prefix}/{coin}", payload)
+        if self.binary_prefix:
+            self._publish('binary', f"{self.binary_prefix}/{coin}", encode_binary(price, ts))
+        self._snapshot[coin] = {"price": price, "timestamp": ts}
+        return info
+
+    def _buffer_stats(self):
+        BUFFER_BYTES.set(self.buffer.size_bytes())
+        BUFFER_DROPPED.set(self.buffer.dropped_segments)
+
+    def _publish(self, kind, topic, payload):
+        info = self.client.publish(topic, payload, qos=self.qos, retain=self.retain)
+        PUBLISHES.inc(kind=kind)
+        if getattr(info, 'rc', 0) != 0:
+            PUBLISH_FAILURES.inc(kind=kind)
+        return info
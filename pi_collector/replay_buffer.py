@@ -0,0 +1,197 @@
+# replay_buffer.py
+# Bounded on-disk FIFO of ticks the collector could not publish, replayed
+# in order once the broker is back. Records are appended to numbered
+# segment files; each carries a CRC so a torn write from a crash is found
+# and cut off on open. The read cursor (segment, offset) is persisted
+# atomically after each replayed batch. When the segments exceed
+# `max_bytes` the oldest are dropped, so disk use is capped and memory use
+# does not depend on the length of the outage.
+#
+# Layout under `root`:
+#   <seq:010d>.seg   frames of FRAME (payload length, crc32) + payload
+#   cursor           JSON {"seq": ..., "offset": ...}
+import json
+import logging
+import os
+import struct
+import threading
+import zlib
+
+logger = logging.getLogger(__name__)
+
+FRAME = struct.Struct('<HI')     # payload length, crc32(payload)
+TICK = struct.Struct('<dd')      # timestamp, price; followed by the utf-8 coin id
+
+
+def encode(ts, coin, price):
+    payload = TICK.pack(ts, price) + coin.encode()
+    return FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def decode_frames(data):
+    """Yield (end_offset, (ts, coin, price)) for each intact frame in data;
+    stops at the first short or corrupt one."""
+    pos = 0
+    while pos + FRAME.size <= len(data):
+        length, crc = FRAME.unpack_from(data, pos)
+        start, end = pos + FRAME.size, pos + FRAME.size + length
+        if end > len(data) or length < TICK.size:
+            return
+        payload = data[start:end]
+        if zlib.crc32(payload) != crc:
+            return
+        ts, price = TICK.unpack_from(payload)
+        yield end, (ts, payload[TICK.size:].decode(), price)
+        pos = end
+
+
+class ReplayBuffer:
+    def __init__(self, root, max_bytes=64 * 1024 * 1024, segment_bytes=1024 * 1024, fsync=True):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self.dropped_segments = 0
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self._segments = sorted(int(n[:-4]) for n in os.listdir(root) if n.endswith('.seg'))
+        self._cursor = self._load_cursor()
+        if self._segments:
+            self._repair(self._segments[-1])
+        else:
+            self._cursor = (self._cursor[0], 0)
+            self._segments.append(self._cursor[0])
+        self._writer = open(self._path(self._segments[-1]), 'ab')
+
+    # ---- public API ----
+
+    def append(self, records):
+        """Append [(ts, coin, price), ...]; durable once this returns."""
+        if not records:
+            return
+        data = b''.join(encode(ts, coin, price) for ts, coin, price in records)
+        with self._lock:
+            if self._writer.tell() and self._writer.tell() + len(data) > self.segment_bytes:
+                self._rotate()
+            self._writer.write(data)
+            self._writer.flush()
+            if self.fsync:
+                os.fsync(self._writer.fileno())
+            self._enforce_limit()
+
+    def read(self, max_records):
+        """Up to max_records of the oldest unreplayed ticks, in append order,
+        and the position to commit() once they are published."""
+        records = []
+        with self._lock:
+            seq, offset = self._cursor
+            while len(records) < max_records:
+                with open(self._path(seq), 'rb') as f:
+                    f.seek(offset)
+                    data = f.read((max_records - len(records)) * 128)
+                    if len(data) >= FRAME.size:
+                        # A long coin id can make one frame larger than the
+                        # estimate; always read at least the first full frame
+                        need = FRAME.size + FRAME.unpack_from(data)[0]
+                        if need > len(data):
+                            data += f.read(need - len(data))
+                end = 0
+                for end, record in decode_frames(data):
+                    records.append(record)
+                    if len(records) == max_records:
+                        break
+                offset += end
+                if end:
+                    continue
+                # No intact frame left in this segment
+                if seq == self._segments[-1]:
+                    break
+                seq, offset = self._next_segment(seq), 0
+        return records, (seq, offset)
+
+    def commit(self, position):
+        """Mark everything before `position` (from read()) as replayed."""
+        with self._lock:
+            seq, offset = position
+            if seq < self._segments[0]:
+                return  # dropped while the batch was in flight
+            self._cursor = (seq, offset)
+            self._save_cursor()
+            # Fully replayed segments are no longer needed
+            while self._segments[0] < seq:
+                os.remove(self._path(self._segments.pop(0)))
+
+    def backlog(self):
+        """True while there are unreplayed ticks."""
+        with self._lock:
+            seq, offset = self._cursor
+            return seq != self._segments[-1] or offset < self._writer.tell()
+
+    def size_bytes(self):
+        with self._lock:
+            return self._size()
+
+    def close(self):
+        with self._lock:
+            self._writer.close()
+
+    # ---- internals ----
+
+    def _path(self, seq):
+        return os.path.join(self.root, f"{seq:010d}.seg")
+
+    def _size(self):
+        return sum(os.path.getsize(self._path(s)) for s in self._segments[:-1]) + self._writer.tell()
+
+    def _next_segment(self, seq):
+        return next(s for s in self._segments if s > seq)
+
+    def _rotate(self):
+        self._writer.close()
+        seq = self._segments[-1] + 1
+        self._segments.append(seq)
+        self._writer = open(self._path(seq), 'ab')
+
+    def _enforce_limit(self):
+        while len(self._segments) > 1 and self._size() > self.max_bytes:
+            seq = self._segments.pop(0)
+            os.remove(self._path(seq))
+            self.dropped_segments += 1
+            if self._cursor[0] <= seq:
+                self._cursor = (self._segments[0], 0)
+                self._save_cursor()
+            logger.warning(f"ReplayBuffer: Over {self.max_bytes} bytes, dropped oldest segment {seq}")
+
+    def _repair(self, seq):
+        """Cut a torn or corrupt tail left by a crash mid-append."""
+        path = self._path(seq)
+        with open(path, 'rb') as f:
+            data = f.read()
+        good = 0
+        for good, _ in decode_frames(data):
+            pass
+        if good < len(data):
+            logger.warning(f"ReplayBuffer: Truncating {len(data) - good} bytes of torn data in {path}")
+            with open(path, 'r+b') as f:
+                f.truncate(good)
+
+    def _load_cursor(self):
+        try:
+            with open(os.path.join(self.root, 'cursor')) as f:
+                cursor = json.load(f)
+            seq, offset = int(cursor['seq']), int(cursor['offset'])
+        except (OSError, ValueError, KeyError, TypeError):
+            return (self._segments[0] if self._segments else 0, 0)
+        if self._segments and seq < self._segments[0]:
+            return (self._segments[0], 0)
+        return (seq, offset)
+
+    def _save_cursor(self):
+        path = os.path.join(self.root, 'cursor')
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'seq': self._cursor[0], 'offset': self._cursor[1]}, f)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp, path)
@@ -0,0 +1,195 @@
+# price_client.py
+# Shared CoinGecko client for the collector, the web app and the simulation.
+import math
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+from config import (
+    COINGECKO_API_URL, PRICE_CACHE_TTL, HISTORY_CACHE_TTL,
+    PRICE_FETCH_TIMEOUT, PRICE_FETCH_RETRIES, PRICE_RETRY_AFTER_MAX
+)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+FETCH_SECONDS = metrics.histogram(
+    'price_fetch_duration_seconds', 'Upstream price API request latency', ['endpoint'])
+FETCH_BACKOFFS = metrics.counter(
+    'price_fetch_backoffs_total', 'Upstream responses that triggered a backoff', ['status'])
+
+
+class _Call:
+    """An in-flight request that concurrent identical callers wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class PriceClient:
+    """CoinGecko client with a pooled keep-alive session, a TTL response
+    cache, single-flight merging of identical concurrent requests and
+    adaptive backoff with jitter on 429 and 5xx responses.
+    """
+
+    def __init__(self, base_url=COINGECKO_API_URL, ttl=PRICE_CACHE_TTL,
+                 history_ttl=HISTORY_CACHE_TTL, timeout=PRICE_FETCH_TIMEOUT,
+                 max_retries=PRICE_FETCH_RETRIES, pool_size=10,
+                 backoff_base=1.0, backoff_max=60.0, retry_after_max=PRICE_RETRY_AFTER_MAX):
+        self.base_url = base_url.rstrip('/')
+        self.ttl = ttl
+        self.history_ttl = history_ttl
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_after_max = retry_after_max
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._lock = threading.Lock()
+        self._cache = {}      # key -> (expires_at, data)
+        self._inflight = {}   # key -> _Call
+        # Shared across callers: once upstream pushes back, every request
+        # waits out the cooldown instead of adding to the pressure
+        self._cooldown_until = 0.0
+        # Until then requests fail at once: upstream asked for a longer
+        # pause than any caller thread should sleep
+        self._blocked_until = 0.0
+        self._strikes = 0
+
+    # ---- public API ----
+
+    def simple_price(self, ids, vs_currency):
+        """GET /simple/price, e.g. {"bitcoin": {"usd": 12345}, ...}"""
+        ids = sorted(set(ids))
+        params = {"ids": ",".join(ids), "vs_currencies": vs_currency}
+        return self._get("/simple/price", params, self.ttl)
+
+    def market_chart(self, coin_id, vs_currency, days, interval=None):
+        """GET /coins/<id>/market_chart, e.g. {"prices": [[ts_ms, price], ...], ...}"""
+        params = {"vs_currency": vs_currency, "days": days}
+        if interval:
+            params["interval"] = interval  # e.g. "daily"
+        return self._get(f"/coins/{coin_id}/market_chart", params, self.history_ttl)
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+    # ---- internals ----
+
+    def _get(self, path, params, ttl):
+        key = (path, tuple(sorted(params.items())))
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached and cached[0] > time.monotonic():
+                return cached[1]
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._fetch(path, params)
+            if ttl > 0:
+                with self._lock:
+                    self._cache[key] = (time.monotonic() + ttl, call.result)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            call.done.set()
+
+    def _fetch(self, path, params):
+        url = self.base_url + path
+        endpoint = 'market_chart' if path.endswith('/market_chart') else path.strip('/').replace('/', '_')
+        attempt = 0
+        while True:
+            self._check_blocked()
+            self._wait_cooldown()
+            with FETCH_SECONDS.time(endpoint=endpoint):
+                res = self.session.get(url, params=params, timeout=self.timeout)
+            if res.status_code not in RETRY_STATUSES:
+                res.raise_for_status()
+                with self._lock:
+                    self._strikes = max(0, self._strikes - 1)
+                return res.json()
+
+            if attempt >= self.max_retries:
+                res.raise_for_status()
+            FETCH_BACKOFFS.inc(status=str(res.status_code))
+            self._back_off(res)
+            attempt += 1
+
+    def _back_off(self, res):
+        with self._lock:
+            self._strikes += 1
+            try:
+                retry_after = float(res.headers.get("Retry-After"))
+            except (TypeError, ValueError):
+                retry_after = None
+            if retry_after is not None and not math.isfinite(retry_after):
+                retry_after = None  # malformed; fall back to our own backoff
+            if retry_after is not None and retry_after > self.retry_after_max:
+                # Every caller would sleep that long in _wait_cooldown; fail
+                # fast until the server's deadline instead
+                self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+                raise requests.exceptions.HTTPError(
+                    f"{res.status_code} from {res.url}: Retry-After {retry_after:.0f}s "
+                    f"exceeds {self.retry_after_max:.0f}s", response=res)
+            # Jitter keeps workers that were throttled together from
+            # retrying in lockstep
+            if retry_after is not None:
+                # The server's Retry-After is a floor: jitter only adds to it
+                delay = max(0.0, retry_after) * random.uniform(1.0, 1.5)
+            else:
+                delay = min(self.backoff_max, self.backoff_base * 2 ** (self._strikes - 1))
+                delay *= random.uniform(0.5, 1.5)
+            self._cooldown_until = max(self._cooldown_until, time.monotonic() + delay)
+
+    def _check_blocked(self):
+        with self._lock:
+            remaining = self._blocked_until - time.monotonic()
+        if remaining > 0:
+            raise requests.exceptions.HTTPError(
+                f"CoinGecko asked to pause requests; {remaining:.0f}s left")
+
+    def _wait_cooldown(self):
+        while True:
+            with self._lock:
+                remaining = self._cooldown_until - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(remaining)
+
+
+_default_client = None
+_default_lock = threading.Lock()
+
+
+def get_client():
+    """Process-wide PriceClient shared by every caller."""
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = PriceClient()
+        return _default_client
@@ -0,0 +1,208 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import itertools
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from config import INDICATOR_WINDOWS, COIN_LIST, VS_CURRENCY
+from simulate import fetch_historical
+from tick_store import open_store
+from history_cache import open_cache
+
+INDICATORS = ["SMA", "EMA", "RSI", "MACD", "BB"]
+# Which params each indicator reads, so configs that only differ in
+# unused params are not evaluated twice
+INDICATOR_PARAMS = {
+    "SMA": ("sma",),
+    "EMA": ("ema",),
+    "RSI": ("rsi",),
+    "MACD": ("macd_fast", "macd_slow", "macd_signal"),
+    "BB": ("bb_window",),
+}
+
+# ---- indicators over 1-D float64 arrays (NaN where undefined). They use
+# the same pandas kernels, in the same order of operations, as the shared
+# indicator graph behind simulate.generate_signals: a cumsum-difference
+# mean breaks exact ties at low prices and the votes drift from the live
+# signals ----
+
+def np_rolling_mean(x, window):
+    return pd.Series(x, copy=False).rolling(window).mean().to_numpy()
+
+def np_rolling_std(x, window):
+    return pd.Series(x, copy=False).rolling(window).std().to_numpy()
+
+def np_ema(x, span):
+    # acc += alpha * (v - acc) from acc = x[0]; pandas runs the recursion in
+    # C, the Python loop was the slowest part of a run
+    return pd.Series(x, copy=False).ewm(span=span, adjust=False).mean().to_numpy()
+
+def np_rsi(x, window):
+    delta = np.diff(x, prepend=np.nan)
+    up, down = np.maximum(delta, 0), -np.minimum(delta, 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 100 - 100 / (1 + np_rolling_mean(up, window) / np_rolling_mean(down, window))
+
+
+# ---- worker side ----
+
+_PRICES = None   # (n_coins, T) price matrix, shared read-only by every run
+_MEMO = {}       # (coin_idx, kind, *params) -> array, per worker process
+
+def _init_worker(prices):
+    global _PRICES, _MEMO
+    _PRICES = prices
+    _MEMO = {}
+
+def _memo(key, fn):
+    arr = _MEMO.get(key)
+    if arr is None:
+        arr = _MEMO[key] = fn()
+    return arr
+
+def _vote(ci, name, p):
+    x = _PRICES[ci]
+    with np.errstate(invalid="ignore"):
+        if name == "SMA":
+            return x > _memo((ci, "sma", p["sma"]), lambda: np_rolling_mean(x, p["sma"]))
+        if name == "EMA":
+            return x > _memo((ci, "ema", p["ema"]), lambda: np_ema(x, p["ema"]))
+        if name == "RSI":
+            return _memo((ci, "rsi", p["rsi"]), lambda: np_rsi(x, p["rsi"])) < 30
+        if name == "MACD":
+            def macd_vote():
+                m = (_memo((ci, "ema", p["macd_fast"]), lambda: np_ema(x, p["macd_fast"])) -
+                     _memo((ci, "ema", p["macd_slow"]), lambda: np_ema(x, p["macd_slow"])))
+                return m > np_ema(m, p["macd_signal"])
+            return _memo((ci, "macd", p["macd_fast"], p["macd_slow"], p["macd_signal"]), macd_vote)
+        if name == "BB":
+            w = p["bb_window"]
+            def bb_lower():
+                return (_memo((ci, "sma", w), lambda: np_rolling_mean(x, w)) -
+                        2 * _memo((ci, "std", w), lambda: np_rolling_std(x, w)))
+            return x < _memo((ci, "bb_lower", w), bb_lower)
+    raise ValueError(f"Unknown indicator {name}")
+
+def _metrics(x, signal):
+    """PnL, hit rate, max drawdown and trade count for a long/flat strategy
+    that holds the coin on the bar after each buy signal."""
+    pos = signal[:-1]
+    rets = x[1:] / x[:-1] - 1
+    strat = np.where(pos, rets, 0.0)
+    equity = np.cumprod(1 + strat)
+    drawdown = 1 - equity / np.maximum.accumulate(equity)
+
+    # Trades are runs of consecutive held bars; their return is the ratio of
+    # equity at the run's end and just before its start
+    p = pos.astype(np.int8)
+    edges = np.diff(np.concatenate(([0], p, [0])))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    eq0 = np.concatenate(([1.0], equity))
+    trade_rets = eq0[ends] / eq0[starts] - 1
+    return {
+        "pnl": float(equity[-1] - 1) if len(equity) else 0.0,
+        "hit_rate": float((trade_rets > 0).mean()) if len(trade_rets) else 0.0,
+        "max_drawdown": float(drawdown.max()) if len(drawdown) else 0.0,
+        "trades": int(len(trade_rets)),
+    }
+
+def _run_chunk(jobs):
+    results = []
+    for ci, coin, chosen, params in jobs:
+        votes = sum(_vote(ci, name, params).astype(np.int8) for name in chosen)
+        signal = 2 * votes > len(chosen)   # buy_votes > sell_votes
+        row = {"coin": coin, "indicators": ",".join(chosen)}
+        row.update(_metrics(_PRICES[ci], signal))
+        row.update(params)
+        results.append(row)
+    return results
+
+
+# ---- driver ----
+
+def build_price_matrix(coins, vs_currency, days, store=None, cache=None):
+    """Align the coins' histories on a common time index -> (index, matrix)."""
+    frames = [fetch_historical(c, vs_currency, days, store=store, cache=cache)["price"].rename(c)
+              for c in coins]
+    df = pd.concat(frames, axis=1, join="inner").sort_index().ffill().dropna()
+    return df.index, np.ascontiguousarray(df[coins].to_numpy(dtype=np.float64).T)
+
+def expand_grid(coins, indicator_sets, param_grid):
+    """Yield (coin_idx, coin, chosen, params) for every distinct configuration."""
+    names = sorted(param_grid)
+    for chosen in indicator_sets:
+        used = sorted({k for i in chosen for k in INDICATOR_PARAMS[i]})
+        seen = set()
+        for values in itertools.product(*(param_grid[n] for n in names)):
+            params = dict(zip(names, values))
+            key = tuple(params[k] for k in used)
+            if key in seen:
+                continue
+            seen.add(key)
+            for ci, coin in enumerate(coins):
+                yield ci, coin, list(chosen), {k: params[k] for k in used}
+
+def default_param_grid():
+    """Every value INDICATOR_WINDOWS uses for each param, across horizons."""
+    grid = {}
+    for windows in INDICATOR_WINDOWS.values():
+        for k, v in windows.items():
+            grid.setdefault(k, set()).add(v)
+    return {k: sorted(v) for k, v in grid.items()}
+
+def all_indicator_sets():
+    return [list(c) for r in range(1, len(INDICATORS) + 1)
+            for c in itertools.combinations(INDICATORS, r)]
+
+def run_backtest(prices, coins, indicator_sets, param_grid, workers=None, chunk_size=200):
+    """Evaluate the grid on a process pool; returns results ranked by PnL."""
+    jobs = list(expand_grid(coins, indicator_sets, param_grid))
+    # Chunks stay within one coin so each worker's memo gets reused
+    jobs.sort(key=lambda j: j[0])
+    chunks = [jobs[i:i+chunk_size] for i in range(0, len(jobs), chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(prices,)) as pool:
+        rows = [r for chunk in pool.map(_run_chunk, chunks) for r in chunk]
+    df = pd.DataFrame(rows)
+    if df.empty:
+        return df
+    return df.sort_values(["pnl", "hit_rate"], ascending=False).reset_index(drop=True)
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Batch parameter-sweep backtest over simulate.generate_signals")
+    ap.add_argument("--coins", nargs="+", default=COIN_LIST)
+    ap.add_argument("--days", type=int, default=365)
+    ap.add_argument("--indicators", nargs="+", metavar="SET",
+                    help="indicator sets such as SMA,RSI (default: every combination)")
+    ap.add_argument("--grid", help="JSON file mapping param name to a list of values")
+    ap.add_argument("--param", action="append", default=[], metavar="NAME=V1,V2",
+                    help="override one param's values, e.g. sma=10,20,50")
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--top", type=int, default=20)
+    ap.add_argument("--output", help="write the full ranked table to this CSV")
+    return ap.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    grid = default_param_grid()
+    if args.grid:
+        with open(args.grid) as f:
+            grid.update(json.load(f))
+    for p in args.param:
+        name, values = p.split("=", 1)
+        grid[name] = [int(v) for v in values.split(",")]
+    sets = [s.upper().split(",") for s in args.indicators] if args.indicators else all_indicator_sets()
+
+    _, prices = build_price_matrix(args.coins, VS_CURRENCY, args.days, store=open_store(VS_CURRENCY),
+                                     cache=open_cache())
+    results = run_backtest(prices, args.coins, sets, grid, workers=args.workers)
+    print(results.head(args.top).to_string())
+    print(f"Evaluated {len(results)} configurations.")
+    if args.output:
+        results.to_csv(args.output, index=False)
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,201 @@
+# history_cache.py
+# Incremental on-disk cache of CoinGecko market_chart history for the
+# simulation tools. Each series is one .npy file holding a (2, n) float64
+# array -- row 0 timestamps in ms, row 1 prices -- so both columns are
+# contiguous and load memory-mapped. A repeat request downloads only the
+# tail after the last cached point, or nothing while that point is fresh.
+# index.json records each file's size and last access for LRU eviction
+# under a byte cap, plus cumulative hit/miss counters.
+#
+# Layout under `root`:
+#   <vs_currency>/<coin>.<granularity>.npy
+#   index.json
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import json
+import math
+import shutil
+import threading
+import time
+
+import numpy as np
+
+from config import HISTORY_CACHE_PATH, HISTORY_CACHE_MAX_BYTES
+
+DAY_MS = 86400 * 1000
+# CoinGecko picks the point spacing from the requested span: 5-minutely
+# for 1 day, hourly up to 90 days, daily beyond. Each spacing is cached
+# separately so a series never mixes them.
+GRANULARITY_MS = {"5m": 300 * 1000, "1h": 3600 * 1000, "1d": DAY_MS}
+STAT_KEYS = ("hits", "partial", "misses", "evictions", "points_downloaded")
+
+
+def granularity(days):
+    if days <= 1:
+        return "5m"
+    if days <= 90:
+        return "1h"
+    return "1d"
+
+
+def fetch_market_chart(coin_id, vs_currency, days, interval=None):
+    """Download market_chart prices as a (2, n) [ts_ms, price] array."""
+    from price_client import get_client
+    prices = get_client().market_chart(coin_id, vs_currency, days, interval=interval)["prices"]
+    return np.asarray(prices, dtype=np.float64).reshape(-1, 2).T
+
+
+class HistoryCache:
+    def __init__(self, root, max_bytes=HISTORY_CACHE_MAX_BYTES, fetch=fetch_market_chart):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.fetch = fetch
+        self._lock = threading.Lock()
+        self._index_path = os.path.join(root, "index.json")
+        self._index = self._load_index()
+
+    # ---- public API ----
+
+    def get(self, coin_id, vs_currency, days, now=None):
+        """(ts_ms, prices) for the last `days` days, as read-only views of
+        the memory-mapped cache file; downloads only what is missing."""
+        now_ms = (time.time() if now is None else now) * 1000
+        gran = granularity(days)
+        step = GRANULARITY_MS[gran]
+        start = now_ms - days * DAY_MS
+        rel = os.path.join(vs_currency, f"{coin_id}.{gran}.npy")
+        # Only the daily series needs `interval`; the others follow from `days`
+        interval = "daily" if gran == "1d" else None
+
+        with self._lock:
+            data = self._open(rel)
+            if data is None or not data.shape[1] or data[0, 0] > start + step:
+                outcome, fetch_days = "misses", days
+            elif now_ms - data[0, -1] < step:
+                outcome, fetch_days = "hits", 0
+            else:
+                outcome, fetch_days = "partial", math.ceil((now_ms - data[0, -1]) / DAY_MS) + 1
+                if gran == "5m":
+                    fetch_days = 1
+                elif gran == "1h":
+                    fetch_days = max(2, fetch_days)  # days=1 would come back 5-minutely
+                    if fetch_days > 90:
+                        outcome, fetch_days = "misses", days
+
+            if fetch_days:
+                new = self.fetch(coin_id, vs_currency, fetch_days, interval)
+                self._index["stats"]["points_downloaded"] += new.shape[1]
+                if outcome == "partial":
+                    # The tail replaces everything from its first point on,
+                    # including the previous fetch's provisional last point
+                    keep = np.searchsorted(data[0], new[0, 0]) if new.shape[1] else data.shape[1]
+                    new = np.concatenate([data[:, :keep], new], axis=1)
+                data = self._write(rel, new)
+
+            self._index["stats"][outcome] += 1
+            self._touch(rel)
+            self._evict(keep=rel)
+            self._save_index()
+
+        i = np.searchsorted(data[0], start)
+        return data[0, i:], data[1, i:]
+
+    def stats(self):
+        with self._lock:
+            entries = self._index["entries"]
+            return {
+                **self._index["stats"],
+                "entries": len(entries),
+                "bytes": sum(e["bytes"] for e in entries.values()),
+                "max_bytes": self.max_bytes,
+            }
+
+    def clear(self):
+        with self._lock:
+            for name in os.listdir(self.root) if os.path.isdir(self.root) else ():
+                path = os.path.join(self.root, name)
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+            self._index["entries"] = {}
+            self._save_index()
+
+    # ---- internals ----
+
+    def _open(self, rel):
+        path = os.path.join(self.root, rel)
+        try:
+            return np.load(path, mmap_mode="r")
+        except (OSError, ValueError):
+            # Missing, or torn by a crash mid-write: refetch
+            self._index["entries"].pop(rel, None)
+            return None
+
+    def _write(self, rel, data):
+        # Write-and-rename: views handed out earlier keep mapping the old
+        # file, and a crash never leaves a half-written series
+        path = os.path.join(self.root, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, np.ascontiguousarray(data, dtype=np.float64))
+        os.replace(tmp, path)
+        self._index["entries"][rel] = {"bytes": os.path.getsize(path), "last_access": time.time()}
+        return np.load(path, mmap_mode="r")
+
+    def _touch(self, rel):
+        entry = self._index["entries"].get(rel)
+        if entry is not None:
+            entry["last_access"] = time.time()
+
+    def _evict(self, keep):
+        entries = self._index["entries"]
+        total = sum(e["bytes"] for e in entries.values())
+        for rel in sorted(entries, key=lambda r: entries[r]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            if rel == keep:
+                continue
+            try:
+                os.remove(os.path.join(self.root, rel))
+            except FileNotFoundError:
+                pass
+            total -= entries.pop(rel)["bytes"]
+            self._index["stats"]["evictions"] += 1
+
+    def _load_index(self):
+        try:
+            with open(self._index_path) as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        index.setdefault("entries", {})
+        stats = index.setdefault("stats", {})
+        for key in STAT_KEYS:
+            stats.setdefault(key, 0)
+        return index
+
+    def _save_index(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp = self._index_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self._index, f)
+        os.replace(tmp, self._index_path)
+
+
+def open_cache(root=HISTORY_CACHE_PATH):
+    return HistoryCache(root)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Inspect or clear the market_chart history cache")
+    ap.add_argument("command", choices=["stats", "clear"])
+    args = ap.parse_args()
+    cache = open_cache()
+    if args.command == "clear":
+        cache.clear()
+    print(json.dumps(cache.stats(), indent=2))
+
+if __name__ == "__main__":
+    main()
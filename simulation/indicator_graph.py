@@ -0,0 +1,132 @@
+# indicator_graph.py
+# Shared evaluation of the simulate.py indicators over one price series.
+# Each indicator is built from a few primitive nodes (rolling mean/std,
+# EWM, diff, ...) identified by (op, param, inputs), so equal
+# subexpressions are the same node: Bollinger's middle band is the SMA of
+# the same window, and MACD's EMAs are the EMA indicator when spans match.
+# A node is computed once per graph and memoized in float64: every node
+# ends up in a vote comparison, and float32 rounding flips ties at
+# low-priced coins. Downcast copies for plotting if memory matters.
+import weakref
+
+import numpy as np
+import pandas as pd
+
+PRICE = ("price", None)
+
+
+def _rolling_mean(window, x):
+    return pd.Series(x, copy=False).rolling(window).mean().to_numpy()
+
+def _rolling_std(window, x):
+    return pd.Series(x, copy=False).rolling(window).std().to_numpy()
+
+def _ewm(span, x):
+    return pd.Series(x, copy=False).ewm(span=span, adjust=False).mean().to_numpy()
+
+def _rsi(_, ma_up, ma_down):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 100 - 100 / (1 + ma_up / ma_down)
+
+# op -> fn(param, *input arrays); NaN wherever the pandas versions in
+# simulate.py give NaN
+OPS = {
+    "rolling_mean": _rolling_mean,
+    "rolling_std": _rolling_std,
+    "ewm": _ewm,
+    "diff": lambda _, x: np.diff(x, prepend=np.nan),
+    "gain": lambda _, x: np.maximum(x, 0),
+    "loss": lambda _, x: -np.minimum(x, 0),
+    "sub": lambda _, a, b: a - b,
+    "band": lambda k, mean, std: mean + k * std,
+    "rsi": _rsi,
+}
+
+
+class IndicatorGraph:
+    """Memoized indicator nodes over one 1-D price series."""
+
+    def __init__(self, prices):
+        self._memo = {PRICE: np.ascontiguousarray(prices, dtype=np.float64)}
+        self.computed = 0   # nodes evaluated so far; repeats are memo hits
+
+    # ---- nodes ----
+
+    def node(self, op, param=None, *inputs):
+        if op not in OPS:
+            raise ValueError(f"Unknown op {op}")
+        return (op, param, *inputs)
+
+    def sma(self, window):
+        return self.node("rolling_mean", window, PRICE)
+
+    def ema(self, span):
+        return self.node("ewm", span, PRICE)
+
+    def rsi(self, window):
+        delta = self.node("diff", None, PRICE)
+        return self.node("rsi", None,
+                         self.node("rolling_mean", window, self.node("gain", None, delta)),
+                         self.node("rolling_mean", window, self.node("loss", None, delta)))
+
+    def macd(self, fast, slow, signal):
+        line = self.node("sub", None, self.ema(fast), self.ema(slow))
+        return line, self.node("ewm", signal, line)
+
+    def bollinger(self, window, k=2):
+        mean, std = self.sma(window), self.node("rolling_std", window, PRICE)
+        return self.node("band", k, mean, std), self.node("band", -k, mean, std)
+
+    def indicators(self, chosen, params):
+        """{output name: node} for the chosen simulate.py indicators."""
+        nodes = {}
+        if "SMA" in chosen:
+            nodes["sma"] = self.sma(params["sma"])
+        if "EMA" in chosen:
+            nodes["ema"] = self.ema(params["ema"])
+        if "RSI" in chosen:
+            nodes["rsi"] = self.rsi(params["rsi"])
+        if "MACD" in chosen:
+            nodes["macd"], nodes["macd_signal"] = self.macd(
+                params["macd_fast"], params["macd_slow"], params["macd_signal"])
+        if "BB" in chosen:
+            nodes["bb_upper"], nodes["bb_lower"] = self.bollinger(params["bb_window"])
+        return nodes
+
+    # ---- evaluation ----
+
+    def value(self, node):
+        arr = self._memo.get(node)
+        if arr is None:
+            op, param, *inputs = node
+            out = OPS[op](param, *(self.value(i) for i in inputs))
+            arr = self._memo[node] = np.asarray(out, dtype=np.float64)
+            self.computed += 1
+        return arr
+
+    def evaluate(self, nodes):
+        """{name: array} for a {name: node} dict, computing only what is
+        not memoized yet. The arrays are shared; don't modify them."""
+        return {name: self.value(n) for name, n in nodes.items()}
+
+    @property
+    def price(self):
+        return self._memo[PRICE]
+
+    def nbytes(self):
+        return sum(a.nbytes for a in self._memo.values())
+
+
+_graphs = {}   # id(df) -> (weakref to df, graph)
+
+def graph_for(df, column="price"):
+    """The IndicatorGraph of df[column], shared by every caller holding the
+    same DataFrame (generate_signals, then plot) until df is freed. Keyed
+    by identity: prices changed in place are not noticed."""
+    key = (id(df), column)
+    entry = _graphs.get(key)
+    if entry is not None and entry[0]() is df:
+        return entry[1]
+    graph = IndicatorGraph(df[column].to_numpy())
+    _graphs[key] = (weakref.ref(df, lambda _, key=key: _graphs.pop(key, None)), graph)
+    return graph
@@ -0,0 +1,92 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import json
+from config import (
+    MQTT_BROKER, MQTT_PORT, MQTT_TOPIC_PREFIX, MQTT_SIGNAL_TOPIC_PREFIX,
+    INDICATOR_WINDOWS, PUBLISH_INTERVAL
+)
+from mqtt_client import new_client
+from streaming import StreamingSignals
+
+# Subscribes to the collector's price stream and publishes the vote-based
+# signal for each coin to MQTT_SIGNAL_TOPIC_PREFIX/<coin> on every tick.
+#
+# Indicator windows count PUBLISH_INTERVAL steps, not messages: the
+# collector's deadband skips coins whose price barely moved, so a gap of
+# n intervals between two messages is filled with n-1 repeats of the last
+# price before the new one. Retained messages (the broker's last price,
+# re-sent on every connect) and ticks not newer than the last one seen
+# (replays) are ignored.
+
+class SignalService:
+    def __init__(self, chosen, params, client=None, interval=PUBLISH_INTERVAL):
+        self.chosen = chosen
+        self.params = params
+        self.interval = interval
+        # A gap longer than this many steps refills every window anyway
+        self.max_fill = 3 * max(params.values())
+        self.engines = {}   # coin -> StreamingSignals
+        self.last = {}      # coin -> (timestamp, price) of the last update
+        self.client = client or new_client("crypto-signal-service")
+        self.client.on_connect = self._on_connect
+        self.client.on_message = self._on_message
+
+    def _on_connect(self, client, userdata, flags, rc):
+        if rc == 0:
+            client.subscribe(f"{MQTT_TOPIC_PREFIX}/#", qos=1)
+
+    def _on_message(self, client, userdata, msg):
+        if msg.retain:
+            return  # not a new tick, just the broker's copy of the last one
+        coin = msg.topic.rsplit("/", 1)[-1]
+        try:
+            data = json.loads(msg.payload)
+            price = float(data["price"])
+        except (ValueError, TypeError, KeyError):
+            return
+        result = self.handle_price(coin, price, data.get("timestamp"))
+        if result is None:
+            return
+        payload = json.dumps({
+            "signal": result["signal"],
+            "buy_votes": result["buy_votes"],
+            "sell_votes": result["sell_votes"],
+            "votes": result["votes"],
+            "price": price,
+            "timestamp": data.get("timestamp"),
+        })
+        client.publish(f"{MQTT_SIGNAL_TOPIC_PREFIX}/{coin}", payload, qos=1, retain=True)
+
+    def handle_price(self, coin, price, ts=None):
+        """Feed one price; returns the engine's result, or None for a tick
+        older than the last one."""
+        engine = self.engines.get(coin)
+        if engine is None:
+            engine = self.engines[coin] = StreamingSignals(self.chosen, self.params)
+        if isinstance(ts, (int, float)) and coin in self.last:
+            last_ts, last_price = self.last[coin]
+            if last_ts is not None:
+                if ts <= last_ts:
+                    return None
+                steps = round((ts - last_ts) / self.interval)
+                for _ in range(min(steps - 1, self.max_fill)):
+                    engine.update(last_price)
+        self.last[coin] = (ts if isinstance(ts, (int, float)) else None, price)
+        return engine.update(price)
+
+    def run(self):
+        self.client.connect(MQTT_BROKER, MQTT_PORT)
+        self.client.loop_forever()
+
+def main():
+    ap = argparse.ArgumentParser(description="Publish live buy/sell signals from the MQTT price feed")
+    ap.add_argument("--horizon", choices=sorted(INDICATOR_WINDOWS), default="short")
+    ap.add_argument("--indicators", default="SMA,EMA,RSI,MACD,BB")
+    args = ap.parse_args()
+    chosen = [i.strip().upper() for i in args.indicators.split(",")]
+    SignalService(chosen, INDICATOR_WINDOWS[args.horizon]).run()
+
+if __name__=="__main__":
+    main()
@@ -1,15 +1,49 @@
-import requests, pandas as pd
-import matplotlib.pyplot as plt
-from config import INDICATOR_WINDOWS
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-def fetch_historical(coin_id, vs_currency, days):
-    url = f"https://api.coingecko.com/api/v3/coins/{coin_id}/market_chart"
-    res = requests.get(url, params={"vs_currency": vs_currency, "days": days})
-    data = res.json()["prices"]
+import time
+from config import INDICATOR_WINDOWS, COIN_LIST, VS_CURRENCY
+from tick_store import open_store
+
+# pandas, matplotlib and the HTTP client are imported where they are first
+# needed; the interactive prompts and importers of the indicator functions
+# (backtest, streaming checks) don't pay for what they don't use.
+
+def fetch_historical(coin_id, vs_currency, days, store=None, cache=None):
+    if store is not None:
+        df = read_store(store, coin_id, days)
+        if df is not None:
+            return df
+    import pandas as pd
+    if cache is not None:
+        # The price column stays a view of the memory-mapped cache file
+        ts, price = cache.get(coin_id, vs_currency, days)
+        index = pd.DatetimeIndex(pd.to_datetime(ts, unit="ms"), name="date")
+        return pd.DataFrame({"price": price}, index=index, copy=False)
+    from price_client import get_client
+    data = get_client().market_chart(coin_id, vs_currency, days)["prices"]
     df = pd.DataFrame(data, columns=["ts","price"])
     df["date"] = pd.to_datetime(df["ts"], unit="ms")
     return df.set_index("date")[["price"]]
 
+def read_store(store, coin_id, days):
+    """Price history from the collector's tick store, or None if the store
+    does not reach back `days` days (close prices for rollups)."""
+    end = time.time()
+    start = end - days * 86400
+    resolution = store.pick_resolution(start, end)
+    first = store.first_timestamp(coin_id, resolution)
+    step = 86400 if resolution == "1d" else 3600
+    if first is None or first > start + step:
+        return None
+    rows = store.query(coin_id, start, end, resolution)
+    if not rows:
+        return None
+    import pandas as pd
+    df = pd.DataFrame({"ts": [r[0] for r in rows], "price": [r[-1] for r in rows]})
+    df["date"] = pd.to_datetime(df["ts"], unit="s")
+    return df.set_index("date")[["price"]]
+
 def sma(prices, window):    return prices.rolling(window).mean()
 def ema(prices, window):    return prices.ewm(span=window, adjust=False).mean()
 def rsi(prices, window):
@@ -39,48 +73,62 @@ def choose_indicators():
     return [opts[int(i)-1] for i in picks.split(",")]
 
 def generate_signals(df, chosen, params):
+    # The indicators above are the reference; signals and plot evaluate them
+    # through one shared graph, so common windows are computed once per df
+    import numpy as np
+    import pandas as pd
+    from indicator_graph import graph_for
+    graph = graph_for(df)
+    ind = graph.evaluate(graph.indicators(chosen, params))
+    price = graph.price
     sig = pd.DataFrame(index=df.index)
-    price = df["price"]
-    votes = pd.DataFrame(index=df.index)
 
     if "SMA" in chosen:
-        sig["sma"] = price > sma(price, params["sma"])
+        sig["sma"] = price > ind["sma"]
     if "EMA" in chosen:
-        sig["ema"] = price > ema(price, params["ema"])
+        sig["ema"] = price > ind["ema"]
     if "RSI" in chosen:
-        r = rsi(price, params["rsi"])
-        sig["rsi"] = r < 30
+        sig["rsi"] = ind["rsi"] < 30
     if "MACD" in chosen:
-        m, s = macd(price, params["macd_fast"], params["macd_slow"], params["macd_signal"])
-        sig["macd"] = m > s
+        sig["macd"] = ind["macd"] > ind["macd_signal"]
     if "BB" in chosen:
-        up, dn = bollinger(price, params["bb_window"])
-        sig["bb"] = price < dn
+        sig["bb"] = price < ind["bb_lower"]
 
-    sig["buy_votes"] = sig.sum(axis=1)
+    sig["buy_votes"] = np.count_nonzero(sig.to_numpy(), axis=1)  # row-wise DataFrame.sum is far slower
     sig["sell_votes"] = len(chosen) - sig["buy_votes"]
     sig["signal"] = sig["buy_votes"] > sig["sell_votes"]
     return sig
 
 def plot(df, sig, chosen, params):
+    import matplotlib.pyplot as plt
+    import numpy as np
+    from indicator_graph import graph_for
+    graph = graph_for(df)
+    ind = graph.evaluate(graph.indicators(chosen, params))  # memo hits after generate_signals
+    # float32 is plenty on screen and halves what matplotlib holds; the
+    # float64 memo the votes used stays untouched
+    ind = {k: v.astype(np.float32) for k, v in ind.items() if k in ("sma", "ema")}
     plt.figure(figsize=(12,6))
     plt.plot(df.index, df["price"], label="Price")
     if "SMA" in chosen:
-        plt.plot(df.index, sma(df["price"],params["sma"]), label=f"SMA{params['sma']}")
+        plt.plot(df.index, ind["sma"], label=f"SMA{params['sma']}")
     if "EMA" in chosen:
-        plt.plot(df.index, ema(df["price"],params["ema"]), label=f"EMA{params['ema']}")
-    buys = sig[sig["signal"] & ~sig["signal"].shift(1)]
-    sells = sig[~sig["signal"] & sig["signal"].shift(1)]
+        plt.plot(df.index, ind["ema"], label=f"EMA{params['ema']}")
+    prev = sig["signal"].shift(1, fill_value=False)
+    buys = sig[sig["signal"] & ~prev]
+    sells = sig[~sig["signal"] & prev]
     plt.scatter(buys.index, df.loc[buys.index,"price"], marker="^", label="Buy")
     plt.scatter(sells.index, df.loc[sells.index,"price"], marker="v", label="Sell")
     plt.legend(); plt.title("Backtest Signals")
     plt.show()
 
 def main():
+    from history_cache import open_cache
     coin = input(f"Coin ({', '.join(COIN_LIST)}): ")
     days = int(input("Days history: "))
     horizon = input("Horizon (short/long): ")
-    df = fetch_historical(coin, VS_CURRENCY, days)
+    df = fetch_historical(coin, VS_CURRENCY, days, store=open_store(VS_CURRENCY),
+                          cache=open_cache())
     chosen = choose_indicators()
     params = INDICATOR_WINDOWS[horizon]
     sig = generate_signals(df, chosen, params)
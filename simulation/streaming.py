@@ -0,0 +1,191 @@
+"""Incremental versions of the indicators in simulate.py.
+
+Each indicator takes one price per update() call and does O(1) work with
+O(window) memory, so it can run on the live MQTT feed. Values are
+float('nan') until enough prices have been seen, exactly where the pandas
+batch functions produce NaN.
+"""
+import math
+from collections import deque
+
+NAN = float("nan")
+
+
+class RollingWindow:
+    """Ring buffer with a running sum and sum of squares.
+
+    The sums are rebuilt from the buffer every `window` updates so that
+    floating-point drift from add/subtract cannot accumulate.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.buf = deque(maxlen=window)
+        self.total = 0.0
+        self.total_sq = 0.0
+        self._since_resum = 0
+
+    def push(self, x):
+        if len(self.buf) == self.window:
+            old = self.buf[0]
+            self.total -= old
+            self.total_sq -= old * old
+        self.buf.append(x)
+        self.total += x
+        self.total_sq += x * x
+        self._since_resum += 1
+        if self._since_resum >= self.window:
+            self.total = math.fsum(self.buf)
+            self.total_sq = math.fsum(v * v for v in self.buf)
+            self._since_resum = 0
+
+    @property
+    def full(self):
+        return len(self.buf) == self.window
+
+    def mean(self):
+        return self.total / self.window if self.full else NAN
+
+    def std(self):
+        """Sample standard deviation (ddof=1), like pandas rolling().std()."""
+        n = self.window
+        if not self.full or n < 2:
+            return NAN
+        var = (self.total_sq - self.total * self.total / n) / (n - 1)
+        return math.sqrt(max(var, 0.0))
+
+
+class StreamingSMA:
+    def __init__(self, window):
+        self._w = RollingWindow(window)
+        self.value = NAN
+
+    def update(self, price):
+        self._w.push(price)
+        self.value = self._w.mean()
+        return self.value
+
+
+class StreamingEMA:
+    """ewm(span=window, adjust=False).mean(): seeded with the first price."""
+
+    def __init__(self, span):
+        self.alpha = 2.0 / (span + 1)
+        self.value = NAN
+
+    def update(self, price):
+        if math.isnan(self.value):
+            self.value = price
+        else:
+            self.value += self.alpha * (price - self.value)
+        return self.value
+
+
+class StreamingRSI:
+    """RSI over the last `window` price changes.
+
+    By default gains and losses are averaged with a simple rolling mean,
+    matching simulate.rsi. With wilder=True they use Wilder's recursive
+    smoothing instead (seeded with the first simple mean), which needs no
+    buffer at all but no longer matches the batch function.
+    """
+
+    def __init__(self, window, wilder=False):
+        self.window = window
+        self.wilder = wilder
+        self._prev = None
+        self._up = RollingWindow(window)
+        self._down = RollingWindow(window)
+        self._avg_up = self._avg_down = NAN
+        self.value = NAN
+
+    def update(self, price):
+        if self._prev is None:
+            self._prev = price
+            return self.value
+        delta = price - self._prev
+        self._prev = price
+        up, down = max(delta, 0.0), max(-delta, 0.0)
+
+        if self.wilder and not math.isnan(self._avg_up):
+            n = self.window
+            self._avg_up = (self._avg_up * (n - 1) + up) / n
+            self._avg_down = (self._avg_down * (n - 1) + down) / n
+        else:
+            self._up.push(up)
+            self._down.push(down)
+            self._avg_up, self._avg_down = self._up.mean(), self._down.mean()
+
+        self.value = self._rsi(self._avg_up, self._avg_down)
+        return self.value
+
+    @staticmethod
+    def _rsi(avg_up, avg_down):
+        if math.isnan(avg_up) or math.isnan(avg_down):
+            return NAN
+        if avg_down == 0:
+            # rs = inf -> 100, 0/0 -> NaN, as pandas does
+            return 100.0 if avg_up > 0 else NAN
+        return 100 - (100 / (1 + avg_up / avg_down))
+
+
+class StreamingMACD:
+    def __init__(self, fast, slow, signal):
+        self._fast = StreamingEMA(fast)
+        self._slow = StreamingEMA(slow)
+        self._signal = StreamingEMA(signal)
+        self.macd = self.signal = NAN
+
+    def update(self, price):
+        self.macd = self._fast.update(price) - self._slow.update(price)
+        self.signal = self._signal.update(self.macd)
+        return self.macd, self.signal
+
+
+class StreamingBollinger:
+    def __init__(self, window):
+        self._w = RollingWindow(window)
+        self.upper = self.lower = NAN
+
+    def update(self, price):
+        self._w.push(price)
+        m, std = self._w.mean(), self._w.std()
+        self.upper, self.lower = m + 2*std, m - 2*std
+        return self.upper, self.lower
+
+
+class StreamingSignals:
+    """Vote-based signal of simulate.generate_signals, one price at a time."""
+
+    def __init__(self, chosen, params):
+        self.chosen = list(chosen)
+        self.sma = StreamingSMA(params["sma"]) if "SMA" in chosen else None
+        self.ema = StreamingEMA(params["ema"]) if "EMA" in chosen else None
+        self.rsi = StreamingRSI(params["rsi"]) if "RSI" in chosen else None
+        self.macd = (StreamingMACD(params["macd_fast"], params["macd_slow"], params["macd_signal"])
+                     if "MACD" in chosen else None)
+        self.bb = StreamingBollinger(params["bb_window"]) if "BB" in chosen else None
+
+    def update(self, price):
+        # Comparisons against NaN are False, as in the pandas version
+        votes = {}
+        if self.sma:
+            votes["sma"] = price > self.sma.update(price)
+        if self.ema:
+            votes["ema"] = price > self.ema.update(price)
+        if self.rsi:
+            votes["rsi"] = self.rsi.update(price) < 30
+        if self.macd:
+            m, s = self.macd.update(price)
+            votes["macd"] = m > s
+        if self.bb:
+            _, dn = self.bb.update(price)
+            votes["bb"] = price < dn
+        buy_votes = sum(votes.values())
+        sell_votes = len(self.chosen) - buy_votes
+        return {
+            "votes": votes,
+            "buy_votes": buy_votes,
+            "sell_votes": sell_votes,
+            "signal": buy_votes > sell_votes,
+        }
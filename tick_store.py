@@ -0,0 +1,287 @@
+# tick_store.py
+# Append-only local time-series store for collector ticks, with 1m/1h/1d
+# OHLC rollups and retention. Records are fixed-size little-endian structs
+# kept in timestamp order, so any time range is found with a binary search
+# over the file instead of a scan.
+#
+# Layout under `root`:
+#   <coin>/raw/<YYYYMMDD>.ticks   (ts, price)                    one file per UTC day
+#   <coin>/1m.ohlc                (bucket_start, open, high, low, close)
+#   <coin>/1h.ohlc, <coin>/1d.ohlc
+import logging
+import os
+import struct
+import threading
+import time
+
+from config import TICK_STORE_PATH, TICK_STORE_RETENTION, TICK_STORE_COMPACT_GRACE, PUBLISH_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+TICK = struct.Struct('<dd')
+OHLC = struct.Struct('<ddddd')
+
+RESOLUTIONS = (('1m', 60), ('1h', 3600), ('1d', 86400))
+RESOLUTION_SECONDS = dict(RESOLUTIONS)
+DAY = 86400
+
+
+def _read_key(f, rec, index):
+    f.seek(index * rec.size)
+    return struct.unpack_from('<d', f.read(8))[0]
+
+
+def _bisect(f, rec, count, ts):
+    """Index of the first record in f with timestamp >= ts."""
+    lo, hi = 0, count
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if _read_key(f, rec, mid) < ts:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def _read_range(path, rec, start, end):
+    """Records with start <= ts < end from a sorted record file."""
+    if not os.path.exists(path):
+        return []
+    with open(path, 'rb') as f:
+        count = os.fstat(f.fileno()).st_size // rec.size  # ignore a torn tail
+        first = _bisect(f, rec, count, start)
+        last = _bisect(f, rec, count, end)
+        if first >= last:
+            return []
+        f.seek(first * rec.size)
+        data = f.read((last - first) * rec.size)
+    return list(rec.iter_unpack(data))
+
+
+def _first_record(path, rec):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        data = f.read(rec.size)
+    return rec.unpack(data) if len(data) == rec.size else None
+
+
+def _last_record(path, rec):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        count = os.fstat(f.fileno()).st_size // rec.size
+        if count == 0:
+            return None
+        f.seek((count - 1) * rec.size)
+        return rec.unpack(f.read(rec.size))
+
+
+def _day_name(ts):
+    return time.strftime('%Y%m%d', time.gmtime(ts))
+
+
+class TickStore:
+    """Batched tick writer plus rollup/retention maintenance and range queries.
+
+    `retention` maps 'raw', '1m', '1h', '1d' to a maximum age in seconds
+    (None keeps everything).
+    """
+
+    def __init__(self, root=TICK_STORE_PATH, retention=None, batch_size=100, flush_interval=30.0,
+                 grace=TICK_STORE_COMPACT_GRACE):
+        self.root = root
+        self.grace = grace
+        self.retention = dict(TICK_STORE_RETENTION if retention is None else retention)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        self._write_lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._compactor = None
+        self._stop = threading.Event()
+        os.makedirs(root, exist_ok=True)
+
+    # ---- writing ----
+
+    def append(self, coin, ts, price):
+        """Buffer one tick; written to disk in batches."""
+        with self._write_lock:
+            self._buffer.append((coin, float(ts), float(price)))
+            due = (len(self._buffer) >= self.batch_size or
+                   time.monotonic() - self._last_flush >= self.flush_interval)
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._write_lock:
+            batch, self._buffer = self._buffer, []
+            self._last_flush = time.monotonic()
+            files = {}
+            for coin, ts, price in batch:
+                files.setdefault(self._raw_path(coin, ts), []).append(TICK.pack(ts, price))
+            for path, records in files.items():
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'ab') as f:
+                    # Drop a torn record left by a crash mid-write so the
+                    # file stays aligned to whole records
+                    size = f.tell()
+                    if size % TICK.size:
+                        f.truncate(size - size % TICK.size)
+                    f.write(b''.join(records))
+
+    def _raw_path(self, coin, ts):
+        return os.path.join(self.root, coin, 'raw', _day_name(ts) + '.ticks')
+
+    def _rollup_path(self, coin, resolution):
+        return os.path.join(self.root, coin, resolution + '.ohlc')
+
+    def coins(self):
+        return sorted(d for d in os.listdir(self.root)
+                      if os.path.isdir(os.path.join(self.root, d)))
+
+    # ---- compaction ----
+
+    def compact(self, now=None):
+        """Append every completed 1m/1h/1d bucket that is not rolled up yet.
+        A bucket counts as completed `grace` seconds after it ends, so
+        ticks stored late still make it into their bucket."""
+        now = time.time() if now is None else now
+        self.flush()
+        with self._compact_lock:
+            for coin in self.coins():
+                source = None  # previous resolution's name, None for raw ticks
+                for name, seconds in RESOLUTIONS:
+                    self._compact_one(coin, name, seconds, source, now)
+                    source = name
+
+    def _compact_one(self, coin, name, seconds, source, now):
+        path = self._rollup_path(coin, name)
+        last = _last_record(path, OHLC)
+        start = last[0] + seconds if last else 0.0
+        end = ((now - self.grace) // seconds) * seconds  # only whole, settled buckets
+        if start >= end:
+            return
+        if source is None:
+            rows = [(ts, p, p, p, p) for ts, p in self._raw_range(coin, start, end)]
+        else:
+            rows = _read_range(self._rollup_path(coin, source), OHLC, start, end)
+        buckets = []
+        for ts, o, h, l, c in rows:
+            b = (ts // seconds) * seconds
+            if buckets and buckets[-1][0] == b:
+                _, bo, bh, bl, _ = buckets[-1]
+                buckets[-1] = (b, bo, max(bh, h), min(bl, l), c)
+            else:
+                buckets.append((b, o, h, l, c))
+        if buckets:
+            with open(path, 'ab') as f:
+                f.write(b''.join(OHLC.pack(*b) for b in buckets))
+
+    def _raw_range(self, coin, start, end):
+        raw_dir = os.path.join(self.root, coin, 'raw')
+        if not os.path.isdir(raw_dir):
+            return []
+        first_day, last_day = _day_name(max(start, 0)), _day_name(end)
+        rows = []
+        for name in sorted(os.listdir(raw_dir)):
+            day = name.split('.')[0]
+            if first_day <= day <= last_day:
+                rows.extend(_read_range(os.path.join(raw_dir, name), TICK, start, end))
+        return rows
+
+    # ---- retention ----
+
+    def enforce_retention(self, now=None):
+        """Drop data older than the configured retention of each resolution."""
+        now = time.time() if now is None else now
+        with self._compact_lock:
+            for coin in self.coins():
+                max_age = self.retention.get('raw')
+                raw_dir = os.path.join(self.root, coin, 'raw')
+                if max_age is not None and os.path.isdir(raw_dir):
+                    # A day file can go once its whole day is past the cutoff
+                    cutoff_day = _day_name(now - max_age - DAY)
+                    for name in os.listdir(raw_dir):
+                        if name.split('.')[0] < cutoff_day:
+                            os.remove(os.path.join(raw_dir, name))
+                for name, _ in RESOLUTIONS:
+                    max_age = self.retention.get(name)
+                    if max_age is not None:
+                        self._truncate_head(self._rollup_path(coin, name), now - max_age)
+
+    @staticmethod
+    def _truncate_head(path, cutoff):
+        if not os.path.exists(path):
+            return
+        with open(path, 'rb') as f:
+            count = os.fstat(f.fileno()).st_size // OHLC.size
+            first = _bisect(f, OHLC, count, cutoff)
+            if first == 0:
+                return
+            f.seek(first * OHLC.size)
+            keep = f.read((count - first) * OHLC.size)
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(keep)
+        os.replace(tmp, path)
+
+    def start_compaction(self, interval=60.0):
+        """Run flush, compaction and retention in a background thread."""
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.compact()
+                    self.enforce_retention()
+                except OSError as e:
+                    logger.error(f"TickStore: Compaction error: {e}")
+        self._compactor = threading.Thread(target=run, name='tick-store-compactor', daemon=True)
+        self._compactor.start()
+
+    def close(self):
+        self._stop.set()
+        self.flush()
+
+    # ---- queries ----
+
+    def pick_resolution(self, start, end, max_points=2000):
+        """Finest resolution whose point count for [start, end) fits max_points
+        and whose retention still covers `start`."""
+        now = time.time()
+        for name, seconds in (('raw', PUBLISH_INTERVAL),) + RESOLUTIONS:
+            max_age = self.retention.get(name)
+            if max_age is not None and start < now - max_age:
+                continue
+            if (end - start) / seconds <= max_points:
+                return name
+        return '1d'
+
+    def query(self, coin, start, end, resolution=None, max_points=2000):
+        """Return rows for start <= ts < end.
+
+        Raw ticks come back as (ts, price), rollups as
+        (bucket_start, open, high, low, close). With resolution=None the
+        resolution is picked from the range length.
+        """
+        resolution = resolution or self.pick_resolution(start, end, max_points)
+        if resolution == 'raw':
+            return self._raw_range(coin, start, end)
+        return _read_range(self._rollup_path(coin, resolution), OHLC, start, end)
+
+    def first_timestamp(self, coin, resolution):
+        if resolution == 'raw':
+            raw_dir = os.path.join(self.root, coin, 'raw')
+            names = sorted(os.listdir(raw_dir)) if os.path.isdir(raw_dir) else []
+            for name in names:
+                first = _first_record(os.path.join(raw_dir, name), TICK)
+                if first:
+                    return first[0]
+            return None
+        first = _first_record(self._rollup_path(coin, resolution), OHLC)
+        return first[0] if first else None
+
+
+def open_store(vs_currency, **kwargs):
+    """Store for prices quoted in `vs_currency` under TICK_STORE_PATH."""
+    return TickStore(os.path.join(TICK_STORE_PATH, vs_currency), **kwargs)
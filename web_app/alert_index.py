@@ -0,0 +1,135 @@
+import bisect
+import threading
+
+
+class AlertIndex:
+    """In-memory index of pending alerts, keyed by coin.
+
+    For every coin two sorted threshold arrays are kept, one for 'above'
+    alerts and one for 'below' alerts, so that a price update can find the
+    triggered alerts with a bisect instead of scanning the whole table.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # coin -> direction -> (sorted thresholds, alert ids in the same order)
+        self._coins = {}
+        self._entries = {}  # alert id -> (coin, direction, threshold)
+
+    def _arrays(self, coin, direction):
+        by_direction = self._coins.setdefault(coin, {'above': ([], []), 'below': ([], [])})
+        return by_direction[direction]
+
+    def _insert(self, alert_id, coin, direction, threshold):
+        if alert_id in self._entries or direction not in ('above', 'below'):
+            return
+        thresholds, ids = self._arrays(coin, direction)
+        pos = bisect.bisect_right(thresholds, threshold)
+        thresholds.insert(pos, threshold)
+        ids.insert(pos, alert_id)
+        self._entries[alert_id] = (coin, direction, threshold)
+
+    def rebuild(self, alerts):
+        """Replace the index contents with the given pending alerts."""
+        with self._lock:
+            self._coins = {}
+            self._entries = {}
+            for a in alerts:
+                self._insert(a.id, a.coin, a.direction, float(a.threshold))
+
+    def add(self, alert):
+        self.insert(alert.id, alert.coin, alert.direction, alert.threshold)
+
+    def insert(self, alert_id, coin, direction, threshold):
+        with self._lock:
+            self._insert(alert_id, coin, direction, float(threshold))
+
+    def insert_many(self, alerts):
+        """Insert (id, coin, direction, threshold) tuples, sorting each
+        touched threshold array once rather than bisecting per alert."""
+        with self._lock:
+            touched = set()
+            for alert_id, coin, direction, threshold in alerts:
+                if alert_id in self._entries or direction not in ('above', 'below'):
+                    continue
+                threshold = float(threshold)
+                thresholds, ids = self._arrays(coin, direction)
+                thresholds.append(threshold)
+                ids.append(alert_id)
+                self._entries[alert_id] = (coin, direction, threshold)
+                touched.add((coin, direction))
+            for coin, direction in touched:
+                # Stable, so equal thresholds keep insertion order as in _insert
+                thresholds, ids = self._arrays(coin, direction)
+                order = sorted(range(len(ids)), key=thresholds.__getitem__)
+                thresholds[:] = [thresholds[i] for i in order]
+                ids[:] = [ids[i] for i in order]
+
+    def remove_many(self, alert_ids):
+        """Remove several alerts, filtering each touched array once."""
+        with self._lock:
+            removed = set()
+            touched = set()
+            for alert_id in alert_ids:
+                entry = self._entries.pop(alert_id, None)
+                if entry is not None:
+                    removed.add(alert_id)
+                    touched.add(entry[:2])
+            for coin, direction in touched:
+                thresholds, ids = self._arrays(coin, direction)
+                keep = [i for i, alert_id in enumerate(ids) if alert_id not in removed]
+                thresholds[:] = [thresholds[i] for i in keep]
+                ids[:] = [ids[i] for i in keep]
+            return len(removed)
+
+    def remove(self, alert_id):
+        with self._lock:
+            entry = self._entries.pop(alert_id, None)
+            if entry is None:
+                return False
+            coin, direction, threshold = entry
+            thresholds, ids = self._arrays(coin, direction)
+            lo = bisect.bisect_left(thresholds, threshold)
+            hi = bisect.bisect_right(thresholds, threshold)
+            for pos in range(lo, hi):
+                if ids[pos] == alert_id:
+                    del thresholds[pos]
+                    del ids[pos]
+                    break
+            return True
+
+    def coins(self):
+        """Coins that currently have at least one pending alert."""
+        with self._lock:
+            return [coin for coin, by_direction in self._coins.items()
+                    if by_direction['above'][0] or by_direction['below'][0]]
+
+    def count(self, coin):
+        """Number of pending alerts indexed for `coin`."""
+        with self._lock:
+            by_direction = self._coins.get(coin)
+            if not by_direction:
+                return 0
+            return len(by_direction['above'][0]) + len(by_direction['below'][0])
+
+    def triggered(self, coin, price):
+        """Return the ids of alerts for `coin` that fire at `price`.
+
+        'above' alerts fire when price > threshold, 'below' alerts when
+        price < threshold, so each side is a single bisect plus a slice.
+        """
+        with self._lock:
+            by_direction = self._coins.get(coin)
+            if not by_direction:
+                return []
+            above_thresholds, above_ids = by_direction['above']
+            below_thresholds, below_ids = by_direction['below']
+            hits = above_ids[:bisect.bisect_left(above_thresholds, price)]
+            hits += below_ids[bisect.bisect_right(below_thresholds, price):]
+            return hits
+
+    def __contains__(self, alert_id):
+        return alert_id in self._entries
+
+    def __len__(self):
+        return len(self._entries)
@@ -3,23 +3,40 @@ import sys
 # ensure project root is on PYTHONPATH for config import
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+# Build the app with create_app(); importing this module has no side effects.
+#   flask --app app upgrade-db          create/upgrade the database schema
+#   gunicorn -w 4 'app:create_app()'    web workers
+# Each open /stream/prices holds a worker for up to SSE_MAX_STREAM seconds;
+# with dashboards in use run a threaded worker class instead, e.g.
+#   gunicorn -w 4 -k gthread --threads 32 'app:create_app()'
+#   flask --app app run-scheduler       alert scheduler (or SCHEDULER_ENABLED)
+
 import logging # Added for better logging
 import datetime # Added for context_processor
-from flask import Flask, render_template, redirect, url_for, request, flash, current_app
+from flask import Flask, Blueprint, render_template, redirect, url_for, request, flash, current_app, \
+                  jsonify, Response
+from markupsafe import Markup
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
-from flask_mail import Mail # Message class is imported in email_utils
-from flask_apscheduler import APScheduler
 from werkzeug.security import generate_password_hash, check_password_hash
 import random
 import string
-import requests
 import time
+import threading
+import functools
+import hashlib
+import json
 
 # Attempt to import from config.py at the project root
 try:
     from config import SECRET_KEY, SQLALCHEMY_DATABASE_URI, MAIL_SERVER, \
                        MAIL_PORT, MAIL_USE_TLS, MAIL_USERNAME, MAIL_PASSWORD, \
-                       COIN_LIST, VS_CURRENCY, APSCHEDULER_API_ENABLED
+                       COIN_LIST, VS_CURRENCY, APSCHEDULER_API_ENABLED, \
+                       MQTT_BROKER, MQTT_PORT, MQTT_TOPIC_PREFIX, \
+                       MQTT_ALERTS_ENABLED, ALERT_FEED_STALE_AFTER, \
+                       MAIL_OUTBOX_WORKERS, MAIL_OUTBOX_MAX_ATTEMPTS, \
+                       SCHEDULER_COORDINATION, SCHEDULER_LEASE_TTL, SCHEDULER_LOCK_FILE, \
+                       ALERT_INDEX_RESYNC, METRICS_ENABLED, SCHEDULER_ENABLED, \
+                       USER_CACHE_SIZE, USER_CACHE_TTL, ALERT_PAGE_CACHE_SIZE, ALERT_PAGE_CACHE_TTL
 except ImportError:
     # Fallback if config.py is not found (useful for isolated testing, but ensure it exists for real runs)
     print("WARNING: config.py not found or not on PYTHONPATH. Using default/empty values for configuration.")
@@ -33,49 +50,322 @@ except ImportError:
     COIN_LIST = ['bitcoin', 'ethereum']
     VS_CURRENCY = 'usd'
     APSCHEDULER_API_ENABLED = True
+    MQTT_BROKER = 'localhost'
+    MQTT_PORT = 1883
+    MQTT_TOPIC_PREFIX = 'crypto/price'
+    MQTT_ALERTS_ENABLED = False
+    ALERT_FEED_STALE_AFTER = 30
+    MAIL_OUTBOX_WORKERS = 2
+    MAIL_OUTBOX_MAX_ATTEMPTS = 5
+    SCHEDULER_COORDINATION = None
+    SCHEDULER_LEASE_TTL = 60
+    SCHEDULER_LOCK_FILE = 'scheduler.lock'
+    ALERT_INDEX_RESYNC = 600
+    METRICS_ENABLED = True
+    SCHEDULER_ENABLED = False
+    USER_CACHE_SIZE = 10000
+    USER_CACHE_TTL = 300
+    ALERT_PAGE_CACHE_SIZE = 2000
+    ALERT_PAGE_CACHE_TTL = 30
+
+
+from models import db, User, Alert, upgrade_schema # User model is crucial here
+from sqlalchemy import select, union_all, event, insert, update, delete, or_
+import metrics
+from email_utils import MailOutbox, init_outbox, send_email
+from alert_index import AlertIndex
+from coordination import make_coordinator, default_worker_id
+from price_snapshot import PriceSnapshot
+from request_cache import TTLCache, VersionCounter, CachedUser
+from bulk_alerts import parse_rows, validate
+
+# cli_group=None keeps the commands at the top level: `flask upgrade-db`
+bp = Blueprint('main', __name__, cli_group=None)
+
+login_manager = LoginManager()
+login_manager.login_view = 'main.login'
+login_manager.login_message_category = 'info' # Optional: for styling flash messages
 
 
-from models import db, User, Alert # User model is crucial here
-from email_utils import send_email
-
-app = Flask(__name__)
-
-# Configuration from config.py (or defaults if import failed)
-app.config['SECRET_KEY'] = SECRET_KEY
-app.config['SQLALCHEMY_DATABASE_URI'] = SQLALCHEMY_DATABASE_URI
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False # Recommended to disable
-app.config['MAIL_SERVER'] = MAIL_SERVER
-app.config['MAIL_PORT'] = MAIL_PORT
-app.config['MAIL_USE_TLS'] = MAIL_USE_TLS
-app.config['MAIL_USERNAME'] = MAIL_USERNAME
-app.config['MAIL_PASSWORD'] = MAIL_PASSWORD
-app.config['APSCHEDULER_API_ENABLED'] = APSCHEDULER_API_ENABLED
-
-
-# Ensure Flask-Mail has a default sender
-app.config['MAIL_DEFAULT_SENDER'] = app.config.get('MAIL_USERNAME') or 'no-reply@example.com'
-
-# Initialize database
-db.init_app(app)
-with app.app_context():
-    db.create_all()
-
-# Initialize Mail
-mail = Mail(app)
-
-# Login manager
-login_manager = LoginManager(app)
-login_manager.login_view = 'login'
-login_manager.login_message_category = 'info' # Optional: for styling flash messages
+def create_app(config=None):
+    """Build the Flask app; `config` overrides the values from config.py.
+
+    Nothing expensive happens here. The schema is created by the
+    `upgrade-db` command, mail threads start with the first email, the MQTT
+    consumer with the first /stream/prices client, and the alert scheduler
+    only when SCHEDULER_ENABLED is set (or under `run-scheduler`).
+    """
+    app = Flask(__name__)
+    app.config.update(
+        SECRET_KEY=SECRET_KEY,
+        SQLALCHEMY_DATABASE_URI=SQLALCHEMY_DATABASE_URI,
+        SQLALCHEMY_TRACK_MODIFICATIONS=False, # Recommended to disable
+        MAIL_SERVER=MAIL_SERVER,
+        MAIL_PORT=MAIL_PORT,
+        MAIL_USE_TLS=MAIL_USE_TLS,
+        MAIL_USERNAME=MAIL_USERNAME,
+        MAIL_PASSWORD=MAIL_PASSWORD,
+        MAIL_OUTBOX_WORKERS=MAIL_OUTBOX_WORKERS,
+        MAIL_OUTBOX_MAX_ATTEMPTS=MAIL_OUTBOX_MAX_ATTEMPTS,
+        APSCHEDULER_API_ENABLED=APSCHEDULER_API_ENABLED,
+        SCHEDULER_ENABLED=SCHEDULER_ENABLED,
+        SCHEDULER_COORDINATION=SCHEDULER_COORDINATION,
+        SCHEDULER_LEASE_TTL=SCHEDULER_LEASE_TTL,
+        SCHEDULER_LOCK_FILE=SCHEDULER_LOCK_FILE,
+        ALERT_INDEX_RESYNC=ALERT_INDEX_RESYNC,
+        ALERT_FEED_STALE_AFTER=ALERT_FEED_STALE_AFTER,
+        MQTT_BROKER=MQTT_BROKER,
+        MQTT_PORT=MQTT_PORT,
+        MQTT_TOPIC_PREFIX=MQTT_TOPIC_PREFIX,
+        MQTT_ALERTS_ENABLED=MQTT_ALERTS_ENABLED,
+        METRICS_ENABLED=METRICS_ENABLED,
+    )
+    if config:
+        app.config.update(config)
+    app.config.setdefault('MAIL_DEFAULT_SENDER', app.config.get('MAIL_USERNAME') or 'no-reply@example.com')
+
+    # Initialize database (engines connect on first use)
+    db.init_app(app)
+    if app.config['METRICS_ENABLED']:
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(db.engine, 'after_cursor_execute', _after_cursor_execute)
+
+    # Outgoing mail is queued and sent by background workers over reused SMTP connections
+    init_outbox(MailOutbox(
+        app.config['MAIL_SERVER'], app.config['MAIL_PORT'],
+        username=app.config['MAIL_USERNAME'], password=app.config['MAIL_PASSWORD'],
+        use_tls=app.config['MAIL_USE_TLS'], sender=app.config['MAIL_DEFAULT_SENDER'],
+        workers=app.config['MAIL_OUTBOX_WORKERS'], max_attempts=app.config['MAIL_OUTBOX_MAX_ATTEMPTS'],
+    ))
+
+    login_manager.init_app(app)
+    app.register_blueprint(bp)
+
+    if app.config['SCHEDULER_ENABLED']:
+        start_scheduler(app)
+    return app
+
+
+# Request-path caches. Entries are dropped explicitly when this process
+# changes the data; the TTLs bound how stale a page can be after a change
+# made by another worker (e.g. the scheduler marking alerts sent).
+user_cache = TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL)              # user id -> CachedUser
+alert_pages = TTLCache(ALERT_PAGE_CACHE_SIZE, ALERT_PAGE_CACHE_TTL)  # rendered alert lists
+alert_versions = VersionCounter()                                   # user id -> alert version
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
-
-# Scheduler
-scheduler = APScheduler()
-scheduler.init_app(app)
-scheduler.start()
+    user_id = int(user_id)
+    user = user_cache.get(user_id)
+    if user is None:
+        row = User.query.get(user_id)
+        if row is None:
+            return None
+        user = CachedUser(row)
+        user_cache.set(user_id, user)
+    return user
+
+ALERTS_PAGE_SIZE = 50        # alerts per dashboard / API page
+ALERTS_MAX_PAGE_SIZE = 500
+ALERT_BULK_MAX_ROWS = 100_000  # rows per bulk import request
+ALERT_BULK_MAX_BYTES = 16 * 1024 * 1024  # body size per bulk import request
+ALERT_BULK_CHUNK = 5_000       # rows per INSERT batch and transaction
+ALERT_BULK_MAX_ERRORS = 100    # invalid rows reported back per request
+SSE_KEEPALIVE = 15           # seconds between keepalive comments on /stream/prices
+SSE_MAX_STREAM = 300         # seconds before a stream is closed; EventSource reconnects
+SSE_RETRY_MS = 3000          # reconnect delay the browser is told to use
+SNAPSHOT_POLL_INTERVAL = 60  # seconds between price fetches for streams when MQTT is off
+
+CHECK_ALERTS_SECONDS = metrics.histogram('check_alerts_duration_seconds', 'Duration of the check_alerts scheduler job')
+EVALUATE_SECONDS = metrics.histogram('alert_evaluation_duration_seconds', 'Time to evaluate pending alerts against one price update')
+ALERTS_EVALUATED = metrics.counter('alerts_evaluated_total', 'Pending alerts checked against a price')
+ALERTS_TRIGGERED = metrics.counter('alerts_triggered_total', 'Alerts whose email was queued')
+DB_QUERY_SECONDS = metrics.histogram('db_query_duration_seconds', 'Database statement execution time')
+
+# The start time lives on the execution context, which is dropped with the
+# statement: a statement that raises (no after_cursor_execute) leaves
+# nothing behind to skew later timings
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_start = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    DB_QUERY_SECONDS.observe(time.perf_counter() - context._query_start)
+
+# In-memory index of pending alerts; only filled in a process that
+# evaluates alerts (see init_alerts)
+alert_index = AlertIndex()
+
+def pending_alert_rows(coins=None):
+    """(id, coin, direction, threshold) of unsent alerts, read straight from
+    the covering ix_alert_armed index without building ORM objects.
+    `coins` limits the result to those coins."""
+    query = db.session.query(Alert.id, Alert.coin, Alert.direction, Alert.threshold) \
+        .filter(Alert.sent == False, Alert.refused == False)
+    if coins is not None:
+        query = query.filter(Alert.coin.in_(coins))
+    return query.all()
+
+# Serializes evaluation between the scheduler and the MQTT consumer thread
+_evaluation_lock = threading.Lock()
+# Alerts whose email is queued but not yet delivered, and delivered ids
+# waiting for the batched Alert.sent update
+_inflight_alerts = set()
+_delivered_alerts = []
+_delivered_lock = threading.Lock()
+_flush_lock = threading.Lock()
+# After a failed Alert.sent update the queued ids wait for this timer
+# (exponential backoff) instead of being retried by every delivery
+_flush_retry = None
+_flush_failures = 0
+FLUSH_RETRY_BASE = 1.0       # seconds
+FLUSH_RETRY_MAX = 60.0
+# Latest price per coin, fanned out to every /stream/prices client
+price_snapshot = PriceSnapshot()
+
+# Alert role state, set up by init_alerts/start_scheduler. The coordinator
+# decides which worker evaluates alerts (and for which coins) when several
+# processes run the scheduler; it stays None in web-only workers.
+coordinator = None
+scheduler = None
+price_consumer = None
+_snapshot_poller = None
+_stream_clients = 0
+_alerts_lock = threading.Lock()
+_last_full_sync = 0.0
+# Largest alert id the sync queries have read. Only sync_alert_index moves
+# it: alerts this worker creates and indexes itself may have higher ids
+# than ones other workers commit afterwards, which must still be picked up.
+_synced_id = 0
+
+def _owned_coins():
+    """Coins this worker evaluates, or None for all of them."""
+    if coordinator is None:
+        return None
+    coins = [c for c in COIN_LIST if coordinator.owns(c)]
+    return None if len(coins) == len(COIN_LIST) else coins
+
+
+def _index_owned(rows):
+    """Add freshly created or re-armed (id, coin, direction, threshold)
+    rows to the index, keeping only the coins this worker's shard evaluates."""
+    if coordinator is None:
+        return
+    alert_index.insert_many([r for r in rows if coordinator.owns(r[1])])
+
+
+def sync_alert_index(full=False):
+    """Bring the alert index up to date with the Alert table.
+
+    Other workers insert alerts this process never sees, so each sync picks
+    up rows above the id the previous sync read up to; a full rebuild (on becoming
+    active or changing shards, and every ALERT_INDEX_RESYNC seconds) also
+    catches alerts marked sent or changed elsewhere. Only the coins this
+    worker owns are loaded. Needs an app context.
+    """
+    global _last_full_sync, _synced_id
+    coins = _owned_coins()
+    with _evaluation_lock:
+        if full or time.monotonic() - _last_full_sync >= current_app.config['ALERT_INDEX_RESYNC']:
+            rows = pending_alert_rows(coins)
+            _synced_id = max((r.id for r in rows), default=0)
+            alert_index.rebuild([r for r in rows if r.id not in _inflight_alerts])
+            _last_full_sync = time.monotonic()
+            return
+        query = db.session.query(Alert.id, Alert.coin, Alert.direction, Alert.threshold) \
+            .filter(Alert.sent == False, Alert.refused == False, Alert.id > _synced_id)
+        if coins is not None:
+            query = query.filter(Alert.coin.in_(coins))
+        for r in query.all():
+            _synced_id = max(_synced_id, r.id)
+            if r.id not in _inflight_alerts:
+                alert_index.insert(r.id, r.coin, r.direction, r.threshold)
+
+
+def init_alerts(app):
+    """Make this process an alert evaluator: join the coordination scheme
+    and load the alert index. start_scheduler() calls this; benchmarks call
+    it directly and drive check_alerts() by hand."""
+    global coordinator
+    with _alerts_lock:
+        if coordinator is not None:
+            return coordinator
+        coordinator = make_coordinator(app.config['SCHEDULER_COORDINATION'],
+                                       lease_ttl=app.config['SCHEDULER_LEASE_TTL'],
+                                       lock_file=app.config['SCHEDULER_LOCK_FILE'])
+        with app.app_context():
+            coordinator.refresh()
+            try:
+                sync_alert_index(full=True)
+            except Exception as e:
+                # The periodic resync in coordinate() retries
+                db.session.rollback()
+                current_app.logger.error(f"Alerts: Could not load pending alerts (run `flask upgrade-db`?): {e}")
+        return coordinator
+
+
+def start_scheduler(app):
+    """Run the alert scheduler (and MQTT-driven evaluation) in this process."""
+    global scheduler
+    init_alerts(app)
+    with _alerts_lock:
+        if scheduler is not None:
+            return scheduler
+        from flask_apscheduler import APScheduler
+        scheduler = APScheduler()
+        scheduler.init_app(app)
+        scheduler.add_job('coordinate', coordinate, args=[app], trigger='interval',
+                          seconds=20, misfire_grace_time=20)
+        scheduler.add_job('check_alerts', check_alerts, args=[app], trigger='interval',
+                          seconds=60, misfire_grace_time=90) # Increased misfire_grace_time
+        scheduler.start()
+    if app.config['MQTT_ALERTS_ENABLED']:
+        start_price_consumer(app)
+    return scheduler
+
+
+def start_snapshot_poller(app):
+    """Without the MQTT feed, keep the price snapshot filled for
+    /stream/prices by fetching from CoinGecko while any stream is open."""
+    global _snapshot_poller
+    with _alerts_lock:
+        if _snapshot_poller is None:
+            _snapshot_poller = threading.Thread(target=_poll_snapshot, args=(app,),
+                                                name='snapshot-poller', daemon=True)
+            _snapshot_poller.start()
+        return _snapshot_poller
+
+
+def _poll_snapshot(app):
+    last_fetch = None
+    while True:
+        if _stream_clients and (last_fetch is None
+                                or time.monotonic() - last_fetch >= SNAPSHOT_POLL_INTERVAL):
+            last_fetch = time.monotonic()
+            with app.app_context():
+                prices = fetch_prices(list(COIN_LIST))
+            ts = int(time.time())
+            for coin, price in (prices or {}).items():
+                price_snapshot.update(coin, price, ts)
+        time.sleep(1)
+
+
+def start_price_consumer(app):
+    """Subscribe to the collector's price stream; it feeds the price
+    snapshot and, where the alert role runs, event-driven evaluation."""
+    global price_consumer
+    with _alerts_lock:
+        if price_consumer is None:
+            from price_consumer import PriceConsumer
+            price_consumer = PriceConsumer(app.config['MQTT_BROKER'], app.config['MQTT_PORT'],
+                                           app.config['MQTT_TOPIC_PREFIX'],
+                                           functools.partial(_on_mqtt_price, app),
+                                           # PIDs repeat across containers; host and a
+                                           # random suffix keep session ids unique
+                                           client_id=f"crypto-web-{default_worker_id()}",
+                                           max_age=app.config['ALERT_FEED_STALE_AFTER'])
+            price_consumer.start()
+        return price_consumer
 
 # Basic Logging Configuration
 logging.basicConfig(level=logging.INFO)
@@ -86,22 +376,41 @@ logging.basicConfig(level=logging.INFO)
 # app.logger.addHandler(handler)
 
 
-@app.context_processor
+@bp.cli.command('upgrade-db')
+def upgrade_db_command():
+    """Create missing tables and indexes (new or existing database)."""
+    upgrade_schema()
+    print("Database schema is up to date.")
+
+
+@bp.cli.command('run-scheduler')
+def run_scheduler_command():
+    """Run only the alert scheduler, in the foreground."""
+    start_scheduler(current_app._get_current_object())
+    print("Alert scheduler running; press Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        scheduler.shutdown()
+
+
+@bp.app_context_processor
 def inject_now():
     """Injects the current UTC datetime into templates."""
     return {'now': datetime.datetime.utcnow(), 'VS_CURRENCY': VS_CURRENCY}
 
 
-@app.route('/')
+@bp.route('/')
 def index():
     if current_user.is_authenticated:
-        return redirect(url_for('dashboard'))
-    return redirect(url_for('login'))
+        return redirect(url_for('.dashboard'))
+    return redirect(url_for('.login'))
 
-@app.route('/register', methods=['GET','POST'])
+@bp.route('/register', methods=['GET','POST'])
 def register():
     if current_user.is_authenticated:
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('.dashboard'))
     if request.method == 'POST':
         email = request.form.get('email')
         password = request.form.get('password')
@@ -113,7 +422,7 @@ def register():
         # Prevent duplicate registration
         if User.query.filter_by(email=email).first():
             flash("That email is already registered. Please log in.", "warning")
-            return redirect(url_for('login'))
+            return redirect(url_for('.login'))
 
         pwd_hash  = generate_password_hash(password)
         # Generate a 6-digit confirmation code
@@ -124,7 +433,7 @@ def register():
             db.session.commit()
             send_email(email, "Your confirmation code", f"Your confirmation code is: {code}")
             flash("Confirmation code sent to your email. Please check your inbox (and spam folder).", "success")
-            return redirect(url_for('confirm', email=email))
+            return redirect(url_for('.confirm', email=email))
         except Exception as e:
             db.session.rollback()
             current_app.logger.error(f"Error during registration for {email}: {e}")
@@ -132,22 +441,22 @@ def register():
 
     return render_template('register.html')
 
-@app.route('/confirm', methods=['GET','POST'])
+@bp.route('/confirm', methods=['GET','POST'])
 def confirm():
     email = request.args.get('email')
     if not email:
         flash("No email provided for confirmation.", "danger")
-        return redirect(url_for('register'))
+        return redirect(url_for('.register'))
 
     user_to_confirm = User.query.filter_by(email=email).first()
 
     if not user_to_confirm:
         flash("User not found for this email.", "danger")
-        return redirect(url_for('register'))
+        return redirect(url_for('.register'))
 
     if user_to_confirm.confirmed:
         flash("This email has already been confirmed. Please log in.", "info")
-        return redirect(url_for('login'))
+        return redirect(url_for('.login'))
 
     if request.method == 'POST':
         code_entered = request.form.get('code')
@@ -156,18 +465,19 @@ def confirm():
         elif code_entered == user_to_confirm.confirm_code:
             user_to_confirm.confirmed = True
             db.session.commit()
+            user_cache.pop(user_to_confirm.id)
             flash("Email confirmed successfully. Please log in.", "success")
-            return redirect(url_for('login'))
+            return redirect(url_for('.login'))
         else:
             flash("Invalid confirmation code. Please try again.", "danger")
 
     return render_template('confirm.html', email=email)
 
 
-@app.route('/login', methods=['GET','POST'])
+@bp.route('/login', methods=['GET','POST'])
 def login():
     if current_user.is_authenticated:
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('.dashboard'))
     if request.method == 'POST':
         email = request.form.get('email')
         password = request.form.get('password')
@@ -176,31 +486,123 @@ def login():
         if user_to_login and check_password_hash(user_to_login.password, password):
             if user_to_login.confirmed:
                 login_user(user_to_login)
+                user_cache.set(user_to_login.id, CachedUser(user_to_login))
                 flash('Logged in successfully!', 'success')
                 # Redirect to next page if it exists, otherwise dashboard
                 next_page = request.args.get('next')
-                return redirect(next_page or url_for('dashboard'))
+                return redirect(next_page or url_for('.dashboard'))
             else:
                 flash("Your email is not confirmed. Please check your email for the confirmation code.", "warning")
-                return redirect(url_for('confirm', email=email))
+                return redirect(url_for('.confirm', email=email))
         else:
             flash("Invalid email or password. Please try again.", "danger")
     return render_template('login.html')
 
-@app.route('/logout')
+@bp.route('/logout')
 @login_required
 def logout():
+    user_cache.pop(current_user.id)
     logout_user()
     flash("You have been logged out.", "success")
-    return redirect(url_for('login'))
+    return redirect(url_for('.login'))
 
-@app.route('/dashboard')
+@bp.route('/dashboard')
 @login_required
 def dashboard():
-    alerts = Alert.query.filter_by(user_id=current_user.id).all()
-    return render_template('dashboard.html', alerts=alerts)
+    # Only the first page is rendered here; the rest, and later changes,
+    # are loaded by the page itself from /api/alerts and /stream/prices
+    key = ('dashboard', current_user.id, alert_versions.get(current_user.id))
+    cached = alert_pages.get(key)
+    if cached is None:
+        page = Alert.query.filter_by(user_id=current_user.id).order_by(Alert.id) \
+            .paginate(page=1, per_page=ALERTS_PAGE_SIZE, error_out=False)
+        html = render_template('_alert_items.html', alerts=page.items, page=page.page)
+        cached = (html, bool(page.items), page.has_next)
+        alert_pages.set(key, cached)
+    html, has_alerts, has_more = cached
+    return render_template('dashboard.html', alerts_html=Markup(html), has_alerts=has_alerts,
+                           has_more=has_more, coins=COIN_LIST)
+
+def _alert_json(a):
+    return {'id': a.id, 'coin': a.coin, 'threshold': a.threshold,
+            'direction': a.direction, 'sent': bool(a.sent), 'refused': bool(a.refused)}
+
+@bp.route('/api/alerts')
+@login_required
+def api_alerts():
+    page_num = max(request.args.get('page', 1, type=int), 1)
+    per_page = max(min(request.args.get('per_page', ALERTS_PAGE_SIZE, type=int), ALERTS_MAX_PAGE_SIZE), 1)
+    key = ('api', current_user.id, alert_versions.get(current_user.id), page_num, per_page)
+    cached = alert_pages.get(key)
+    if cached is None:
+        page = Alert.query.filter_by(user_id=current_user.id).order_by(Alert.id) \
+            .paginate(page=page_num, per_page=per_page, error_out=False)
+        body = json.dumps({
+            'alerts': [_alert_json(a) for a in page.items],
+            'page': page.page,
+            'per_page': page.per_page,
+            'total': page.total,
+            'pages': page.pages,
+        })
+        cached = (body, hashlib.sha1(body.encode()).hexdigest())
+        alert_pages.set(key, cached)
+    body, etag = cached
+    response = Response(body, mimetype='application/json')
+    # Clients revalidate with If-None-Match and get a bodiless 304 when
+    # nothing on the page changed
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
+@bp.route('/metrics')
+def metrics_endpoint():
+    # Each WSGI worker has its own registry; scrape workers individually
+    if not current_app.config['METRICS_ENABLED']:
+        return Response(status=404)
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+
+def _sse_event(version, prices):
+    data = json.dumps({'version': version, 'vs_currency': VS_CURRENCY,
+                       'prices': {c: prices[c] for c in COIN_LIST if c in prices}})
+    return f"id: {version}\ndata: {data}\n\n"
+
+@bp.route('/stream/prices')
+def stream_prices():
+    # Web workers subscribe to the price feed on first use, or poll
+    # CoinGecko themselves when there is no feed
+    app = current_app._get_current_object()
+    if app.config['MQTT_ALERTS_ENABLED']:
+        start_price_consumer(app)
+    else:
+        start_snapshot_poller(app)
+
+    def events():
+        global _stream_clients
+        with _alerts_lock:
+            _stream_clients += 1
+        try:
+            # Bounded so a sync worker is not held forever; the browser's
+            # EventSource reconnects after SSE_RETRY_MS
+            deadline = time.monotonic() + SSE_MAX_STREAM
+            version, prices = price_snapshot.get()
+            yield f"retry: {SSE_RETRY_MS}\n" + _sse_event(version, prices)
+            while (remaining := deadline - time.monotonic()) > 0:
+                new_version, prices = price_snapshot.wait_for_change(
+                    version, timeout=min(SSE_KEEPALIVE, remaining))
+                if new_version == version:
+                    yield ": keepalive\n\n"  # keeps proxies from closing an idle stream
+                else:
+                    version = new_version
+                    yield _sse_event(version, prices)
+        finally:
+            with _alerts_lock:
+                _stream_clients -= 1
+
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
-@app.route('/alert/new', methods=['GET','POST'])
+@bp.route('/alert/new', methods=['GET','POST'])
 @login_required
 def new_alert():
     if request.method == 'POST':
@@ -229,8 +631,10 @@ def new_alert():
             try:
                 db.session.add(new_alert_obj)
                 db.session.commit()
+                _index_owned([(new_alert_obj.id, coin, direction, threshold)])
+                alert_versions.bump(current_user.id)
                 flash("Alert created successfully.", "success")
-                return redirect(url_for('dashboard'))
+                return redirect(url_for('.dashboard'))
             except Exception as e:
                 db.session.rollback()
                 current_app.logger.error(f"Error creating alert for user {current_user.id}: {e}")
@@ -238,101 +642,371 @@ def new_alert():
 
     return render_template('alert_form.html', coins=COIN_LIST, VS_CURRENCY=VS_CURRENCY) # Pass VS_CURRENCY
 
-@scheduler.task('interval', id='check_alerts', seconds=60, misfire_grace_time=90) # Increased misfire_grace_time
-def check_alerts():
-    current_app.logger.info("Scheduler: Running check_alerts job.")
-    with app.app_context(): # Ensure app context for DB and mail operations
-        alerts_to_check = Alert.query.filter_by(sent=False).all()
-        if not alerts_to_check:
-            current_app.logger.info("Scheduler: No pending alerts to check.")
-            return
-
-        # Efficiently gather unique coin IDs from pending alerts
-        coin_ids_to_fetch = list(set(a.coin for a in alerts_to_check if a.coin in COIN_LIST))
 
-        if not coin_ids_to_fetch:
-            current_app.logger.info("Scheduler: No alerts for coins in COIN_LIST to check prices for.")
+@bp.route('/api/alerts/bulk', methods=['POST'])
+@login_required
+def bulk_import_alerts():
+    """Create many alerts from a CSV or JSON body (see bulk_alerts.parse_rows).
+
+    Nothing is imported if any row is invalid, unless ?skip_invalid=1.
+    Rows are written in chunks of ALERT_BULK_CHUNK, one multi-row INSERT
+    and commit each; if a chunk fails, the earlier ones stay imported.
+    """
+    # Refuse oversized bodies before reading them; a chunked body has no
+    # length to check, so it is refused too
+    if request.content_length is None:
+        return jsonify(error="Content-Length is required"), 411
+    if request.content_length > ALERT_BULK_MAX_BYTES:
+        return jsonify(error=f"At most {ALERT_BULK_MAX_BYTES} bytes per request"), 413
+    try:
+        rows = parse_rows(request.get_data(cache=False), request.content_type)
+    except ValueError as e:
+        return jsonify(error=f"Could not parse alerts: {e}"), 400
+    if len(rows) > ALERT_BULK_MAX_ROWS:
+        return jsonify(error=f"At most {ALERT_BULK_MAX_ROWS} alerts per request"), 413
+    valid, errors = validate(rows, COIN_LIST)
+    if errors and not request.args.get('skip_invalid', 0, type=int):
+        return jsonify(error=f"{len(errors)} invalid row(s); nothing imported",
+                       errors=errors[:ALERT_BULK_MAX_ERRORS]), 400
+
+    user_id = current_user.id
+    # Core insert on the table skips the ORM's per-row bookkeeping. It
+    # returns the indexed columns rather than asking for parameter order,
+    # which SQLite can only honour one row per statement.
+    table = Alert.__table__
+    stmt = insert(table).returning(table.c.id, table.c.coin, table.c.direction, table.c.threshold)
+    ids = []
+    try:
+        for i in range(0, len(valid), ALERT_BULK_CHUNK):
+            created = db.session.execute(stmt, [
+                {'user_id': user_id, 'coin': coin, 'threshold': threshold,
+                 'direction': direction, 'sent': False}
+                for coin, threshold, direction in valid[i:i+ALERT_BULK_CHUNK]]).all()
+            db.session.commit()
+            ids += sorted(r.id for r in created)
+            _index_owned(created)
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error importing alerts for user {user_id} after {len(ids)} rows: {e}")
+        return jsonify(error="An error occurred while importing alerts.", created=len(ids), ids=ids), 500
+    finally:
+        alert_versions.bump(user_id)
+    return jsonify(created=len(ids), ids=ids, invalid=len(errors),
+                   errors=errors[:ALERT_BULK_MAX_ERRORS]), 201
+
+def _bulk_where(data):
+    """WHERE clauses selecting the current user's alerts for a bulk
+    delete/re-arm body, one list per chunk of ids. The body is a JSON
+    object with "ids", "coin" and/or "direction", or {"all": true}."""
+    if not isinstance(data, dict):
+        raise ValueError("expected a JSON object")
+    where = [Alert.user_id == current_user.id]
+    if data.get('coin') is not None:
+        where.append(Alert.coin == str(data['coin']).strip().lower())
+    if data.get('direction') is not None:
+        if data['direction'] not in ('above', 'below'):
+            raise ValueError("direction must be 'above' or 'below'")
+        where.append(Alert.direction == data['direction'])
+    ids = data.get('ids')
+    if ids is None:
+        if len(where) == 1 and data.get('all') is not True:
+            raise ValueError("select alerts with ids, coin/direction or all=true")
+        return [where]
+    if not isinstance(ids, list) or not all(type(i) is int for i in ids):
+        raise ValueError("ids must be a list of integers")
+    return [where + [Alert.id.in_(ids[i:i+ALERT_BULK_CHUNK])]
+            for i in range(0, len(ids), ALERT_BULK_CHUNK)]
+
+@bp.route('/api/alerts/bulk/delete', methods=['POST'])
+@login_required
+def bulk_delete_alerts():
+    try:
+        chunks = _bulk_where(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    user_id = current_user.id
+    deleted = []
+    try:
+        for where in chunks:
+            deleted += db.session.scalars(delete(Alert).where(*where).returning(Alert.id),
+                                          execution_options={'synchronize_session': False}).all()
+            db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error deleting alerts for user {user_id}: {e}")
+        return jsonify(error="An error occurred while deleting alerts.", deleted=len(deleted)), 500
+    finally:
+        # After the commit and under the evaluation lock, as in _flush_sent:
+        # an evaluation that read these rows earlier still sees any in-flight
+        # ones as in flight, and a failed send no longer puts them back
+        with _evaluation_lock:
+            alert_index.remove_many(deleted)
+            _inflight_alerts.difference_update(deleted)
+        alert_versions.bump(user_id)
+    return jsonify(deleted=len(deleted))
+
+@bp.route('/api/alerts/bulk/rearm', methods=['POST'])
+@login_required
+def bulk_rearm_alerts():
+    """Reset `sent` and `refused` on the selected alerts that already fired
+    or could not be delivered, so they can trigger again."""
+    try:
+        chunks = _bulk_where(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    user_id = current_user.id
+    rearmed = 0
+    try:
+        for where in chunks:
+            rows = db.session.execute(
+                update(Alert).where(*where, or_(Alert.sent == True, Alert.refused == True))
+                .values(sent=False, refused=False)
+                .returning(Alert.id, Alert.coin, Alert.direction, Alert.threshold),
+                execution_options={'synchronize_session': False}).all()
+            db.session.commit()
+            rearmed += len(rows)
+            # Other evaluating workers pick these up at their next full resync
+            _index_owned(rows)
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error re-arming alerts for user {user_id}: {e}")
+        return jsonify(error="An error occurred while re-arming alerts.", rearmed=rearmed), 500
+    finally:
+        alert_versions.bump(user_id)
+    return jsonify(rearmed=rearmed)
+
+
+def evaluate_alerts(prices):
+    """Evaluate pending alerts against a {coin: price} mapping.
+
+    Called from the scheduler fallback and from the MQTT consumer thread;
+    must run inside an app context.
+    """
+    ts = time.strftime("%Y-%m-%d %H:%M:%S UTC")
+    app = current_app._get_current_object()
+    # Under multiple workers only the coins this one owns are evaluated here
+    prices = {coin: price for coin, price in prices.items()
+              if coordinator is not None and coordinator.owns(coin)}
+    with _evaluation_lock, EVALUATE_SECONDS.time():
+        ALERTS_EVALUATED.inc(sum(alert_index.count(coin) for coin in prices))
+        # The in-memory index says, without touching the DB, which coins
+        # have anything to fire at this price
+        live = {coin: price for coin, price in prices.items()
+                if alert_index.triggered(coin, price)}
+        if not live:
+            current_app.logger.debug("Alerts: No alerts triggered.")
             return
 
-        current_app.logger.info(f"Scheduler: Fetching prices for coins: {', '.join(coin_ids_to_fetch)}")
-        try:
-            response = requests.get(
-                "https://api.coingecko.com/api/v3/simple/price",
-                params={"ids": ",".join(coin_ids_to_fetch), "vs_currencies": VS_CURRENCY},
-                timeout=10 # Added timeout
+        # One set-based query lets the database do the filtering through
+        # ix_alert_armed and brings each alert's user along in the same join
+        selects = []
+        for coin, price in live.items():
+            base = select(Alert.id, Alert.coin, Alert.direction, Alert.threshold, User.id, User.email) \
+                .join(User, User.id == Alert.user_id) \
+                .where(Alert.sent == False, Alert.refused == False, Alert.coin == coin)
+            selects.append(base.where(Alert.direction == 'above', Alert.threshold < price))
+            selects.append(base.where(Alert.direction == 'below', Alert.threshold > price))
+        rows = db.session.execute(union_all(*selects)).all()
+
+        triggered = 0
+        for alert_id, coin, direction, threshold, user_id, email in rows:
+            if alert_id in _inflight_alerts:
+                continue
+            current_price = live[coin]
+            current_app.logger.info(f"Alerts: Alert triggered for user {email}, coin {coin}, price {current_price}, threshold {threshold}")
+            # Take the alert out of the index while its email is in flight so
+            # later ticks don't queue it again; Alert.sent is only set once
+            # the SMTP server has accepted the message
+            alert_index.remove(alert_id)
+            _inflight_alerts.add(alert_id)
+            triggered += 1
+            send_email(
+                email,
+                f"Crypto Alert: {coin} {direction} {threshold} {VS_CURRENCY.upper()}",
+                f"Hello {email.split('@')[0]},\n\n"
+                f"This is an alert from Crypto IoT.\n"
+                f"As of {ts}, the price of {coin.capitalize()} is {current_price:.2f} {VS_CURRENCY.upper()}.\n"
+                f"This has triggered your alert set for when the price goes {direction} {threshold:.2f} {VS_CURRENCY.upper()}.\n\n"
+                f"Regards,\nThe Crypto IoT Team",
+                on_sent=functools.partial(_mark_alert_sent, app, alert_id, user_id),
+                on_failed=functools.partial(_alert_send_failed, app, alert_id, coin, direction, threshold),
             )
-            response.raise_for_status()  # Raise an exception for HTTP errors (4xx or 5xx)
-            prices_data = response.json()
-        except requests.exceptions.Timeout:
-            current_app.logger.error("Scheduler: CoinGecko API request timed out.")
-            return
-        except requests.exceptions.RequestException as e:
-            current_app.logger.error(f"Scheduler: Failed to fetch prices from CoinGecko: {e}")
-            return
-        except ValueError as e: # Catches JSON decoding errors
-            current_app.logger.error(f"Scheduler: Failed to decode JSON from CoinGecko: {e}. Response: {response.text if 'response' in locals() else 'N/A'}")
-            return
+        ALERTS_TRIGGERED.inc(triggered)
 
-        ts = time.strftime("%Y-%m-%d %H:%M:%S UTC")
-        users_cache = {} # Cache user objects to avoid redundant DB queries
 
-        for alert_item in alerts_to_check:
-            # Get the user for this alert
-            if alert_item.user_id in users_cache:
-                user = users_cache[alert_item.user_id]
-            else:
-                user = User.query.get(alert_item.user_id)
-                if user:
-                    users_cache[alert_item.user_id] = user
-                else:
-                    current_app.logger.warning(f"Scheduler: User with ID {alert_item.user_id} not found for alert ID {alert_item.id}. Skipping.")
-                    continue # Skip this alert if user not found
+def _mark_alert_sent(app, alert_id, user_id):
+    """Outbox delivery callback: persist Alert.sent for a delivered alert.
 
-            # Get price for the specific coin of the alert
-            coin_price_data = prices_data.get(alert_item.coin)
-            if not coin_price_data or VS_CURRENCY not in coin_price_data:
-                current_app.logger.warning(f"Scheduler: Price not found for coin {alert_item.coin} (vs {VS_CURRENCY}). Alert ID: {alert_item.id}")
-                continue
+    Ids are queued and written with one UPDATE ... WHERE id IN (...) by
+    whichever callback thread gets the flush lock, so bursts of deliveries
+    share a statement and a commit.
+    """
+    with _delivered_lock:
+        _delivered_alerts.append((alert_id, user_id))
+        if _flush_retry is not None:
+            return  # a failed flush is backing off; its retry takes these too
+    _drain_delivered(app)
 
-            try:
-                current_price = float(coin_price_data[VS_CURRENCY])
-            except (ValueError, TypeError):
-                current_app.logger.warning(f"Scheduler: Invalid price format for {alert_item.coin}: {coin_price_data[VS_CURRENCY]}. Alert ID: {alert_item.id}")
+
+def _drain_delivered(app):
+    global _flush_retry, _flush_failures
+    while _delivered_alerts and _flush_lock.acquire(blocking=False):
+        try:
+            with _delivered_lock:
+                batch = list(_delivered_alerts)
+                _delivered_alerts.clear()
+            if not batch:
                 continue
+            if _flush_sent(app, batch):
+                _flush_failures = 0
+                continue
+            # Still delivered; keep them queued (and in flight) and retry
+            # later, so the outbox thread that called us is not held up
+            with _delivered_lock:
+                _delivered_alerts[:0] = batch
+                _flush_failures += 1
+                delay = min(FLUSH_RETRY_MAX, FLUSH_RETRY_BASE * 2 ** (_flush_failures - 1))
+                if _flush_retry is None:
+                    _flush_retry = threading.Timer(delay, _retry_flush, args=(app,))
+                    _flush_retry.daemon = True
+                    _flush_retry.start()
+            return
+        finally:
+            _flush_lock.release()
+
 
+def _retry_flush(app):
+    global _flush_retry
+    with _delivered_lock:
+        _flush_retry = None
+    _drain_delivered(app)
 
-            alert_triggered = False
-            if alert_item.direction == "above" and current_price > alert_item.threshold:
-                alert_triggered = True
-            elif alert_item.direction == "below" and current_price < alert_item.threshold:
-                alert_triggered = True
-
-            if alert_triggered:
-                current_app.logger.info(f"Scheduler: Alert triggered for user {user.email}, coin {alert_item.coin}, price {current_price}, threshold {alert_item.threshold}")
-                try:
-                    send_email(
-                        user.email,
-                        f"Crypto Alert: {alert_item.coin} {alert_item.direction} {alert_item.threshold} {VS_CURRENCY.upper()}",
-                        f"Hello {user.email.split('@')[0]},\n\n"
-                        f"This is an alert from Crypto IoT.\n"
-                        f"As of {ts}, the price of {alert_item.coin.capitalize()} is {current_price:.2f} {VS_CURRENCY.upper()}.\n"
-                        f"This has triggered your alert set for when the price goes {alert_item.direction} {alert_item.threshold:.2f} {VS_CURRENCY.upper()}.\n\n"
-                        f"Regards,\nThe Crypto IoT Team"
-                    )
-                    alert_item.sent = True # Mark as sent
-                    current_app.logger.info(f"Scheduler: Successfully sent alert email to {user.email} for alert ID {alert_item.id}")
-                except Exception as e:
-                    current_app.logger.error(f"Scheduler: Failed to send email to {user.email} for alert ID {alert_item.id}: {e}")
+
+def _flush_sent(app, batch, chunk=500):
+    ids = [alert_id for alert_id, _ in batch]
+    with app.app_context():
         try:
-            db.session.commit() # Commit all changes (e.g., alert_item.sent = True)
-            current_app.logger.info("Scheduler: Committed session changes after checking alerts.")
+            for i in range(0, len(ids), chunk):
+                Alert.query.filter(Alert.id.in_(ids[i:i+chunk])) \
+                    .update({'sent': True}, synchronize_session=False)
+            db.session.commit()
         except Exception as e:
             db.session.rollback()
-            current_app.logger.error(f"Scheduler: Error committing session after checking alerts: {e}")
+            current_app.logger.error(f"Alerts: Error marking {len(ids)} alert(s) as sent, will retry: {e}")
+            return False
+        # Under the evaluation lock so no trigger query that read these rows
+        # before the commit can see them as neither sent nor in flight
+        with _evaluation_lock:
+            _inflight_alerts.difference_update(ids)
+        alert_versions.bump(*{user_id for _, user_id in batch})
+        current_app.logger.info(f"Alerts: Marked {len(ids)} alert(s) as sent")
+        return True
+
+
+def _alert_send_failed(app, alert_id, coin, direction, threshold, permanent=False):
+    """Outbox failure callback: put the alert back so a later tick retries it.
+
+    A permanently refused address would only be refused again, so such an
+    alert is marked Alert.refused instead, which keeps it out of the
+    trigger query and the index resyncs until the user re-arms it.
+    """
+    if permanent:
+        with app.app_context():
+            try:
+                Alert.query.filter_by(id=alert_id).update({'refused': True}, synchronize_session=False)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                current_app.logger.error(f"Alerts: Error marking alert {alert_id} as refused: {e}")
+    with _evaluation_lock:
+        if alert_id in _inflight_alerts:  # unless it was deleted meanwhile
+            _inflight_alerts.discard(alert_id)
+            if not permanent:
+                alert_index.insert(alert_id, coin, direction, threshold)
+
+
+def coordinate(app):
+    """Renew this worker's lease/shard membership and resync the alert index."""
+    with app.app_context():
+        became_active = coordinator.refresh()
+        if coordinator.active:
+            sync_alert_index(full=became_active)
+
+
+def check_alerts(app):
+    with app.app_context(), CHECK_ALERTS_SECONDS.time(): # Ensure app context for DB and mail operations
+        current_app.logger.info("Scheduler: Running check_alerts job.")
+        if coordinator is None or not coordinator.active:
+            current_app.logger.info("Scheduler: Another worker holds the alert lease; skipping.")
+            return
+        if price_consumer and price_consumer.is_fresh(app.config['ALERT_FEED_STALE_AFTER']):
+            current_app.logger.info("Scheduler: MQTT price feed is live; skipping fallback fetch.")
+            return
+
+        # Fetch every coin, not only those with pending alerts: the price
+        # snapshot behind /stream/prices needs them all and it is one
+        # upstream request either way
+        prices = fetch_prices(list(COIN_LIST))
+        if prices is None:
+            return
+        ts = int(time.time())
+        for coin, price in prices.items():
+            price_snapshot.update(coin, price, ts)
+        evaluate_alerts(prices)
+
+
+def fetch_prices(coin_ids_to_fetch):
+    """{coin: price} from CoinGecko, or None if the request failed."""
+    # Only processes without the MQTT feed get here (the scheduler's
+    # fallback, the snapshot poller); import requests lazily for them
+    import requests
+    from price_client import get_client
+
+    current_app.logger.info(f"Scheduler: Fetching prices for coins: {', '.join(coin_ids_to_fetch)}")
+    try:
+        prices_data = get_client().simple_price(coin_ids_to_fetch, VS_CURRENCY)
+    except requests.exceptions.Timeout:
+        current_app.logger.error("Scheduler: CoinGecko API request timed out.")
+        return None
+    except requests.exceptions.RequestException as e:
+        current_app.logger.error(f"Scheduler: Failed to fetch prices from CoinGecko: {e}")
+        return None
+    except ValueError as e: # Catches JSON decoding errors
+        current_app.logger.error(f"Scheduler: Failed to decode JSON from CoinGecko: {e}")
+        return None
+
+    prices = {}
+    for coin in coin_ids_to_fetch:
+        coin_price_data = prices_data.get(coin)
+        if not coin_price_data or VS_CURRENCY not in coin_price_data:
+            current_app.logger.warning(f"Scheduler: Price not found for coin {coin} (vs {VS_CURRENCY}).")
+            continue
+        try:
+            prices[coin] = float(coin_price_data[VS_CURRENCY])
+        except (ValueError, TypeError):
+            current_app.logger.warning(f"Scheduler: Invalid price format for {coin}: {coin_price_data[VS_CURRENCY]}.")
+            continue
+    return prices
+
+
+def _on_mqtt_price(app, coin, price, ts, live=True):
+    if coin not in COIN_LIST:
+        return
+    price_snapshot.update(coin, price, ts)
+    # Web-only workers just keep the snapshot for /stream/prices; retained
+    # and replayed ticks are old prices, so they never trigger alerts
+    if not live or coordinator is None or not coordinator.owns(coin):
+        return
+    with app.app_context():
+        evaluate_alerts({coin: price})
 
 
 if __name__ == '__main__':
     # For development only; use a real WSGI server (e.g., Gunicorn, uWSGI) in production
+    app = create_app()
+    with app.app_context():
+        upgrade_schema()
+    start_scheduler(app)
     # Ensure the host is accessible if running in a container or VM
     # Debug mode should be False in production
     app.run(host='0.0.0.0', port=5000, debug=False)
@@ -0,0 +1,67 @@
+import csv
+import io
+import json
+import math
+
+FIELDS = ('coin', 'threshold', 'direction')
+DIRECTIONS = frozenset(('above', 'below'))
+
+
+def parse_rows(body, content_type):
+    """Alert rows (dicts) from a CSV body with a coin,threshold,direction
+    header, or a JSON list of objects (bare or under "alerts").
+
+    Raises ValueError if the body is not well-formed.
+    """
+    text = body.decode('utf-8-sig')
+    if 'json' in (content_type or ''):
+        data = json.loads(text)
+        if isinstance(data, dict):
+            data = data.get('alerts')
+        if not isinstance(data, list) or not all(isinstance(r, dict) for r in data):
+            raise ValueError("expected a list of alert objects")
+        return data
+    reader = csv.DictReader(io.StringIO(text))
+    try:
+        missing = [f for f in FIELDS if f not in (reader.fieldnames or ())]
+        if missing:
+            raise ValueError(f"CSV header is missing {', '.join(missing)}")
+        return list(reader)
+    except csv.Error as e:
+        raise ValueError(f"bad CSV: {e}")
+
+
+def _threshold(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if math.isfinite(value) else None
+
+
+def validate(rows, coins):
+    """Check every row in one pass per column.
+
+    Returns ([(coin, threshold, direction), ...] for the valid rows,
+    [{'row': n, 'error': ...}, ...] for the others); rows count from 1.
+    """
+    coin_col = [str(r.get('coin') or '').strip().lower() for r in rows]
+    threshold_col = [_threshold(r.get('threshold')) for r in rows]
+    direction_col = [str(r.get('direction') or '').strip().lower() for r in rows]
+
+    coins = frozenset(coins)
+    problems = {}
+    for i, c in enumerate(coin_col):
+        if c not in coins:
+            problems.setdefault(i, []).append(f"unknown coin '{c}'")
+    for i, t in enumerate(threshold_col):
+        if t is None:
+            problems.setdefault(i, []).append("threshold must be a number")
+    for i, d in enumerate(direction_col):
+        if d not in DIRECTIONS:
+            problems.setdefault(i, []).append("direction must be 'above' or 'below'")
+
+    valid = [(coin_col[i], threshold_col[i], direction_col[i])
+             for i in range(len(rows)) if i not in problems]
+    errors = [{'row': i + 1, 'error': '; '.join(msgs)} for i, msgs in sorted(problems.items())]
+    return valid, errors
@@ -0,0 +1,192 @@
+import logging
+import os
+import socket
+import time
+import uuid
+import zlib
+
+from sqlalchemy import update, delete
+from sqlalchemy.exc import IntegrityError
+
+from models import db, SchedulerLease, SchedulerMember
+
+logger = logging.getLogger(__name__)
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+class Coordinator:
+    """Decides which WSGI worker evaluates alerts, and for which coins.
+
+    refresh() is called periodically from every worker's scheduler (inside
+    an app context) and returns True when this worker has just become
+    active, i.e. it should rebuild its alert index before evaluating.
+    """
+
+    def __init__(self, worker_id=None):
+        self.worker_id = worker_id or default_worker_id()
+        self.active = False
+
+    def refresh(self):
+        was_active = self.active
+        self.active = True
+        return not was_active
+
+    def owns(self, coin):
+        return self.active
+
+    def release(self):
+        self.active = False
+
+
+class SqlLeaseCoordinator(Coordinator):
+    """Leader election with a lease row in the application database.
+
+    The leader renews its lease on every refresh(); if it dies, another
+    worker takes over once `ttl` seconds have passed. Acquire and renew are
+    a single conditional UPDATE, so two workers can never both succeed.
+    """
+
+    def __init__(self, name='check_alerts', ttl=60.0, worker_id=None):
+        super().__init__(worker_id)
+        self.name = name
+        self.ttl = ttl
+
+    def refresh(self):
+        now = time.time()
+        was_active = self.active
+        try:
+            result = db.session.execute(
+                update(SchedulerLease)
+                .where(SchedulerLease.name == self.name)
+                .where((SchedulerLease.owner == self.worker_id) | (SchedulerLease.expires_at < now))
+                .values(owner=self.worker_id, expires_at=now + self.ttl))
+            if result.rowcount == 0:
+                # Either someone else holds a live lease or no row exists yet
+                db.session.add(SchedulerLease(name=self.name, owner=self.worker_id,
+                                              expires_at=now + self.ttl))
+            db.session.commit()
+            self.active = True
+        except IntegrityError:
+            db.session.rollback()
+            self.active = False
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Coordinator: Lease refresh failed: {e}")
+            self.active = False
+        if self.active != was_active:
+            logger.info(f"Coordinator: {self.worker_id} {'acquired' if self.active else 'lost'} lease '{self.name}'")
+        return self.active and not was_active
+
+    def release(self):
+        if self.active:
+            db.session.execute(
+                update(SchedulerLease)
+                .where(SchedulerLease.name == self.name, SchedulerLease.owner == self.worker_id)
+                .values(expires_at=0))
+            db.session.commit()
+        self.active = False
+
+
+class FileLockCoordinator(Coordinator):
+    """Leader election with an exclusive flock(); the lock is held for the
+    life of the process and released by the OS if it dies. Only works for
+    workers on the same host."""
+
+    def __init__(self, path, worker_id=None):
+        super().__init__(worker_id)
+        self.path = path
+        self._fd = None
+
+    def refresh(self):
+        if self.active:
+            return False
+        import fcntl
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, self.worker_id.encode())
+        self._fd = fd
+        self.active = True
+        logger.info(f"Coordinator: {self.worker_id} acquired lock file {self.path}")
+        return True
+
+    def release(self):
+        if self._fd is not None:
+            os.close(self._fd)  # closing drops the flock
+            self._fd = None
+        self.active = False
+
+
+class ShardCoordinator(Coordinator):
+    """Splits alert evaluation by coin across all live workers.
+
+    Workers heartbeat into the scheduler_member table; each one takes the
+    coins whose stable hash falls on its rank among the live members, so
+    adding workers spreads the load instead of duplicating it. While
+    membership changes a coin may briefly have two owners or none, until
+    every worker has refreshed once.
+    """
+
+    def __init__(self, ttl=60.0, worker_id=None):
+        super().__init__(worker_id)
+        self.ttl = ttl
+        self.rank = 0
+        self.members = 1
+
+    def refresh(self):
+        now = time.time()
+        was = (self.active, self.rank, self.members)
+        try:
+            if db.session.get(SchedulerMember, self.worker_id) is None:
+                db.session.add(SchedulerMember(worker_id=self.worker_id, heartbeat_at=now))
+            else:
+                db.session.execute(update(SchedulerMember)
+                                   .where(SchedulerMember.worker_id == self.worker_id)
+                                   .values(heartbeat_at=now))
+            # Forget workers that stopped heartbeating long ago
+            db.session.execute(delete(SchedulerMember)
+                               .where(SchedulerMember.heartbeat_at < now - 10 * self.ttl))
+            db.session.commit()
+            live = [m for (m,) in db.session.query(SchedulerMember.worker_id)
+                    .filter(SchedulerMember.heartbeat_at >= now - self.ttl)
+                    .order_by(SchedulerMember.worker_id)]
+            self.members = len(live)
+            self.rank = live.index(self.worker_id)
+            self.active = True
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Coordinator: Shard heartbeat failed: {e}")
+            self.active = False
+        if (self.active, self.rank, self.members) != was:
+            logger.info(f"Coordinator: {self.worker_id} is shard {self.rank + 1}/{self.members}")
+            # The set of owned coins changed; the caller must resync
+            return self.active
+        return False
+
+    def owns(self, coin):
+        return self.active and zlib.crc32(coin.encode()) % self.members == self.rank
+
+    def release(self):
+        db.session.execute(delete(SchedulerMember).where(SchedulerMember.worker_id == self.worker_id))
+        db.session.commit()
+        self.active = False
+
+
+def make_coordinator(mode, lease_ttl=60.0, lock_file=None):
+    """mode: None (single process), 'sql' (lease), 'file' (flock) or 'shard'."""
+    if not mode:
+        return Coordinator()
+    if mode == 'sql':
+        return SqlLeaseCoordinator(ttl=lease_ttl)
+    if mode == 'file':
+        return FileLockCoordinator(lock_file)
+    if mode == 'shard':
+        return ShardCoordinator(ttl=lease_ttl)
+    raise ValueError(f"Unknown scheduler coordination mode: {mode}")
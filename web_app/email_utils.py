@@ -1,31 +1,210 @@
-
+import logging
+import queue
 import smtplib
+import threading
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from getpass import getpass
-
-
-def send_email(to, subject, body):
-    # Configuration (Modify these values)
-    SMTP_SERVER = "smtp.sharif.edu"
-    PORT = 587                    
-    SENDER_EMAIL = "sepehr.mizanian@sharif.edu"
-    RECEIVER_EMAIL = to
-
-    # Get password securely
-    password = "123456aA@#$%^&*"
-
-    msg = MIMEMultipart()
-    msg['From'] = SENDER_EMAIL
-    msg['To'] = RECEIVER_EMAIL
-    msg['Subject'] = subject
-    msg.attach(MIMEText(body, 'plain'))
-
-    try:
-        with smtplib.SMTP(SMTP_SERVER, PORT) as server:
-            server.starttls()
-            server.login(SENDER_EMAIL, password)
-            server.sendmail(SENDER_EMAIL, RECEIVER_EMAIL, msg.as_string())
-        print("✓ Email sent successfully using app password!")
-    except Exception as e:
-        print(f"× Error: {str(e)}")
\ No newline at end of file
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+SMTP_SEND_SECONDS = metrics.histogram('smtp_send_duration_seconds', 'Time to hand one message to the SMTP server')
+EMAILS_SENT = metrics.counter('emails_sent_total', 'Messages accepted by the SMTP server')
+EMAILS_RETRIED = metrics.counter('email_retries_total', 'Failed send attempts that were retried')
+EMAILS_FAILED = metrics.counter('emails_failed_total', 'Messages given up on after the last retry or a permanent refusal')
+
+
+class OutgoingEmail:
+    def __init__(self, to, subject, body, on_sent=None, on_failed=None):
+        self.to = to
+        self.subject = subject
+        self.body = body
+        self.on_sent = on_sent        # called once the server accepted the message
+        self.on_failed = on_failed    # called with permanent=True|False once given up on
+        self.attempts = 0
+
+    def as_string(self, sender):
+        msg = MIMEMultipart()
+        msg['From'] = sender
+        msg['To'] = self.to
+        msg['Subject'] = self.subject
+        msg.attach(MIMEText(self.body, 'plain'))
+        return msg.as_string()
+
+
+class MailOutbox:
+    """In-process mail queue drained by worker threads.
+
+    Each worker keeps one authenticated SMTP connection open and sends many
+    messages over it, reconnecting when the server drops it, after
+    `messages_per_connection` messages or after `idle_timeout` seconds
+    without work. Failed sends are retried with exponential backoff; a
+    permanent (5xx) refusal of the message is not.
+    """
+
+    def __init__(self, server, port, username=None, password=None, use_tls=False,
+                 sender='no-reply@example.com', workers=2, max_attempts=5,
+                 backoff_base=2.0, backoff_max=300.0, messages_per_connection=100,
+                 idle_timeout=30.0, timeout=30.0):
+        self.server = server
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.sender = sender
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.messages_per_connection = messages_per_connection
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._queue = queue.Queue()
+        self._threads = []
+        self._stopping = threading.Event()
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        with self._start_lock:
+            if self._threads:
+                return
+            self._stopping.clear()
+            for i in range(self.workers):
+                t = threading.Thread(target=self._run, name=f"mail-outbox-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def stop(self, timeout=10.0):
+        self._stopping.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    def enqueue(self, to, subject, body, on_sent=None, on_failed=None):
+        if not self._threads:
+            self.start()  # workers are started on first use
+        self._queue.put(OutgoingEmail(to, subject, body, on_sent, on_failed))
+
+    def pending(self):
+        return self._queue.qsize()
+
+    # ---- worker ----
+
+    def _connect(self):
+        conn = smtplib.SMTP(self.server, self.port, timeout=self.timeout)
+        conn.ehlo()
+        if self.use_tls:
+            conn.starttls()
+            conn.ehlo()
+        if self.username:
+            conn.login(self.username, self.password)
+        return conn
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.quit()
+        except (smtplib.SMTPException, OSError):
+            conn.close()
+
+    def _run(self):
+        conn = None
+        sent_on_conn = 0
+        while not self._stopping.is_set():
+            try:
+                email = self._queue.get(timeout=self.idle_timeout if conn else 1.0)
+            except queue.Empty:
+                if conn is not None:
+                    self._close(conn)
+                    conn = None
+                continue
+
+            try:
+                with SMTP_SEND_SECONDS.time():
+                    if conn is None:
+                        conn = self._connect()
+                        sent_on_conn = 0
+                    conn.sendmail(self.sender, [email.to], email.as_string(self.sender))
+                sent_on_conn += 1
+            except Exception as e:
+                if self._permanent(e):
+                    # sendmail() has reset the session; the connection is fine
+                    self._give_up(email, e, permanent=True)
+                    continue
+                if conn is not None:
+                    self._close(conn)
+                    conn = None
+                self._retry(email, e)
+                continue
+            finally:
+                self._queue.task_done()
+
+            EMAILS_SENT.inc()
+            logger.info(f"MailOutbox: Sent '{email.subject}' to {email.to}")
+            self._callback(email.on_sent)
+            if sent_on_conn >= self.messages_per_connection:
+                self._close(conn)
+                conn = None
+
+        if conn is not None:
+            self._close(conn)
+
+    @staticmethod
+    def _permanent(error):
+        """True for a 5xx refusal of this message's sender, recipient or
+        data; resending it would get the same answer. Login and connection
+        errors are about the server, not the message, and stay retryable."""
+        if isinstance(error, smtplib.SMTPRecipientsRefused):
+            return bool(error.recipients) and all(
+                code >= 500 for code, _ in error.recipients.values())
+        if isinstance(error, (smtplib.SMTPSenderRefused, smtplib.SMTPDataError)):
+            return error.smtp_code >= 500
+        return False
+
+    def _give_up(self, email, error, permanent):
+        EMAILS_FAILED.inc()
+        if permanent:
+            logger.error(f"MailOutbox: {email.to} refused '{email.subject}': {error}")
+        else:
+            logger.error(f"MailOutbox: Giving up on {email.to} after {email.attempts} attempts: {error}")
+        self._callback(email.on_failed, permanent=permanent)
+
+    def _retry(self, email, error):
+        email.attempts += 1
+        if email.attempts >= self.max_attempts:
+            self._give_up(email, error, permanent=False)
+            return
+        EMAILS_RETRIED.inc()
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (email.attempts - 1))
+        logger.warning(f"MailOutbox: Send to {email.to} failed ({error}); retrying in {delay:.0f}s")
+        timer = threading.Timer(delay, self._queue.put, args=(email,))
+        timer.daemon = True
+        timer.start()
+
+    @staticmethod
+    def _callback(fn, **kwargs):
+        if fn is None:
+            return
+        try:
+            fn(**kwargs)
+        except Exception as e:
+            logger.error(f"MailOutbox: Delivery callback failed: {e}")
+
+
+_outbox = None
+
+
+def init_outbox(outbox):
+    """Install the process-wide outbox used by send_email(); its worker
+    threads start with the first email."""
+    global _outbox
+    _outbox = outbox
+    return _outbox
+
+
+def send_email(to, subject, body, on_sent=None, on_failed=None):
+    """Queue an email on the outbox; returns immediately."""
+    if _outbox is None:
+        raise RuntimeError("Mail outbox not initialised; call init_outbox() first")
+    _outbox.enqueue(to, subject, body, on_sent=on_sent, on_failed=on_failed)
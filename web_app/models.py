@@ -1,5 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
+from sqlalchemy import inspect, text
 
 db = SQLAlchemy()
 
@@ -11,9 +12,69 @@ class User(UserMixin, db.Model):
     confirm_code = db.Column(db.String(6))  # 6-digit code
 
 class Alert(db.Model):
+    __table_args__ = (
+        # Serves the trigger query: sent=0 AND refused=0 AND coin=? AND direction=? AND threshold <|> ?
+        db.Index('ix_alert_armed', 'sent', 'refused', 'coin', 'direction', 'threshold'),
+        db.Index('ix_alert_user_id', 'user_id'),
+    )
+
     id          = db.Column(db.Integer, primary_key=True)
     user_id     = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     coin        = db.Column(db.String(50), nullable=False)
     threshold   = db.Column(db.Float, nullable=False)
     direction   = db.Column(db.String(4), nullable=False)  # 'above' or 'below'
-    sent        = db.Column(db.Boolean, default=False)
\ No newline at end of file
+    sent        = db.Column(db.Boolean, default=False)
+    # The mail server permanently (5xx) refused the user's address; the
+    # alert is not evaluated again until it is re-armed
+    refused     = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+
+
+class SchedulerLease(db.Model):
+    # One row per lease; whoever holds an unexpired row runs the job
+    name        = db.Column(db.String(50), primary_key=True)
+    owner       = db.Column(db.String(100), nullable=False)
+    expires_at  = db.Column(db.Float, nullable=False)  # unix time
+
+class SchedulerMember(db.Model):
+    # Live workers taking part in sharded alert evaluation
+    worker_id    = db.Column(db.String(100), primary_key=True)
+    heartbeat_at = db.Column(db.Float, nullable=False)  # unix time
+
+
+# Indexes superseded by a newer definition under another name
+OBSOLETE_INDEXES = ('ix_alert_pending',)
+
+
+def upgrade_schema():
+    """Bring an existing database up to the current models.
+
+    create_all() only creates missing tables, so columns and indexes added
+    to a table that already exists (e.g. an old app.db) are created here,
+    and indexes that were replaced are dropped. New columns must be
+    nullable or have a server default. Safe to run repeatedly; needs an
+    app context.
+    """
+    db.create_all()
+    inspector = inspect(db.engine)
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            existing = {c['name'] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} " \
+                      f"{column.type.compile(dialect=db.engine.dialect)}"
+                if column.server_default is not None:
+                    default = column.server_default.arg
+                    if not isinstance(default, str):
+                        default = default.compile(dialect=db.engine.dialect)
+                    ddl += f" DEFAULT {default}"
+                if not column.nullable:
+                    ddl += " NOT NULL"
+                conn.execute(text(ddl))
+    for name in OBSOLETE_INDEXES:
+        db.session.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    db.session.commit()
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
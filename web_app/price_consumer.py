@@ -0,0 +1,97 @@
+import json
+import logging
+import threading
+import time
+
+import metrics
+from mqtt_client import new_client
+
+logger = logging.getLogger(__name__)
+
+MESSAGES_RECEIVED = metrics.counter('mqtt_messages_received_total', 'Price messages received from the broker')
+RECEIVE_LAG_SECONDS = metrics.histogram(
+    'mqtt_publish_to_receive_lag_seconds', 'Receive time minus the collector timestamp of live price messages',
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0, 120.0))
+
+
+class PriceConsumer:
+    """Background MQTT subscriber for the collector's price stream.
+
+    Subscribes to `<topic_prefix>/#` and calls `on_price(coin, price, ts,
+    live)` from the paho network thread for every valid price message.
+    `live` is False for retained messages and for ticks stamped more than
+    `max_age` seconds ago (e.g. the collector replaying its outage buffer),
+    which are history rather than the current price.
+    """
+
+    def __init__(self, broker, port, topic_prefix, on_price, client_id="crypto-web-alerts",
+                 max_age=None):
+        self.broker = broker
+        self.port = port
+        self.topic_prefix = topic_prefix.rstrip('/')
+        self.on_price = on_price
+        self.max_age = max_age
+        self._client = new_client(client_id)
+        self._client.on_connect = self._on_connect
+        self._client.on_message = self._on_message
+        self._last_message_at = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        # connect_async + loop_start keeps retrying in the background if the
+        # broker is not up yet, so app startup never blocks on it
+        self._client.reconnect_delay_set(min_delay=1, max_delay=30)
+        self._client.connect_async(self.broker, self.port)
+        self._client.loop_start()
+        logger.info(f"PriceConsumer: Connecting to {self.broker}:{self.port}")
+
+    def stop(self):
+        self._client.disconnect()
+        self._client.loop_stop()
+
+    def last_message_age(self):
+        """Seconds since the last valid price message, or None if none yet."""
+        with self._lock:
+            if self._last_message_at is None:
+                return None
+            return time.monotonic() - self._last_message_at
+
+    def is_fresh(self, max_age):
+        age = self.last_message_age()
+        return age is not None and age <= max_age
+
+    def _on_connect(self, client, userdata, flags, rc):
+        if rc != 0:
+            logger.warning(f"PriceConsumer: Connection refused (rc={rc})")
+            return
+        topic = f"{self.topic_prefix}/#"
+        client.subscribe(topic, qos=1)
+        logger.info(f"PriceConsumer: Subscribed to {topic}")
+
+    def _on_message(self, client, userdata, msg):
+        coin = msg.topic.rsplit('/', 1)[-1]
+        try:
+            data = json.loads(msg.payload)
+            price = float(data["price"])
+            ts = data.get("timestamp")
+        except (ValueError, TypeError, KeyError) as e:
+            logger.warning(f"PriceConsumer: Ignoring malformed message on {msg.topic}: {e}")
+            return
+        MESSAGES_RECEIVED.inc()
+        live = not msg.retain
+        if not msg.retain:
+            # Retained messages replayed on (re)connect say nothing about
+            # whether the collector is still publishing
+            with self._lock:
+                self._last_message_at = time.monotonic()
+            if isinstance(ts, (int, float)):
+                # The collector stamps whole seconds, so this is +/- 1s
+                lag = time.time() - ts
+                RECEIVE_LAG_SECONDS.observe(max(0.0, lag))
+                if self.max_age is not None and lag > self.max_age:
+                    live = False
+        try:
+            self.on_price(coin, price, ts, live)
+        except Exception as e:
+            # Never let a handler error kill the paho network thread
+            logger.error(f"PriceConsumer: Error handling price for {coin}: {e}")
@@ -0,0 +1,37 @@
+import threading
+
+
+class PriceSnapshot:
+    """Latest price per coin, shared by every /stream/prices client.
+
+    Writers call update(); readers block in wait_for_change() on a
+    condition variable, so N open dashboards share one price source.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._prices = {}    # coin -> {"price": float, "timestamp": int | None}
+        self.version = 0
+
+    def update(self, coin, price, ts=None):
+        with self._cond:
+            current = self._prices.get(coin)
+            if current and current["price"] == price:
+                return
+            if current and ts is not None and (current["timestamp"] or 0) > ts:
+                return  # a replayed tick older than what we show
+            self._prices[coin] = {"price": price, "timestamp": ts}
+            self.version += 1
+            self._cond.notify_all()
+
+    def get(self):
+        """Return (version, {coin: {...}}) for the current snapshot."""
+        with self._cond:
+            return self.version, dict(self._prices)
+
+    def wait_for_change(self, since_version, timeout=None):
+        """Block until the version moves past `since_version` or `timeout`
+        expires; returns the snapshot as get() does."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.version != since_version, timeout)
+            return self.version, dict(self._prices)
@@ -0,0 +1,93 @@
+// Progressive updates for the dashboard: live prices over Server-Sent
+// Events and alert status from the paginated /api/alerts endpoint.
+(function () {
+  var script = document.currentScript;
+  var list = document.getElementById('alerts-list');
+  var loadMore = document.getElementById('load-more');
+  var apiUrl = list.dataset.api;
+  var etags = {};       // page -> ETag of the last response
+  var pagesLoaded = 1;
+  var REFRESH_MS = 30000;
+
+  // ---- live prices ----
+  var stream = new EventSource(script.dataset.stream);
+  stream.onmessage = function (event) {
+    var snapshot = JSON.parse(event.data);
+    Object.keys(snapshot.prices).forEach(function (coin) {
+      var row = document.querySelector('#live-prices li[data-coin="' + coin + '"] .price');
+      if (row) {
+        row.textContent = snapshot.prices[coin].price.toFixed(2) + ' ' + snapshot.vs_currency.toUpperCase();
+      }
+    });
+  };
+
+  // ---- alerts ----
+  function renderAlert(a) {
+    var li = document.createElement('li');
+    li.dataset.id = a.id;
+    var left = document.createElement('span');
+    var coin = document.createElement('strong');
+    coin.textContent = a.coin;
+    var threshold = document.createElement('strong');
+    threshold.textContent = a.threshold.toFixed(2);
+    left.append(coin, ' - ' + a.direction.charAt(0).toUpperCase() + a.direction.slice(1) + ' ', threshold);
+    var right = document.createElement('span');
+    var status = document.createElement('strong');
+    status.className = a.sent ? 'text-success' : a.refused ? 'text-danger' : 'text-warning';
+    status.textContent = a.sent ? 'Sent' : a.refused ? 'Undeliverable' : 'Pending';
+    right.append('Status: ', status);
+    li.append(left, right);
+    return li;
+  }
+
+  function fetchPage(page) {
+    var headers = {};
+    if (etags[page]) headers['If-None-Match'] = etags[page];
+    return fetch(apiUrl + '?page=' + page, {headers: headers, credentials: 'same-origin'})
+      .then(function (res) {
+        if (res.status === 304) return null;   // unchanged since last time
+        if (!res.ok) throw new Error(res.status);
+        etags[page] = res.headers.get('ETag');
+        return res.json();
+      });
+  }
+
+  function applyPage(data) {
+    // Rows remember the page they came from, so alerts deleted (or moved to
+    // another page) since the last refresh of this page can be dropped
+    var current = {};
+    data.alerts.forEach(function (a) {
+      current[a.id] = true;
+      var fresh = renderAlert(a);
+      fresh.dataset.page = data.page;
+      var old = list.querySelector('li[data-id="' + a.id + '"]');
+      if (old) list.replaceChild(fresh, old); else list.appendChild(fresh);
+    });
+    Array.prototype.forEach.call(list.querySelectorAll('li[data-page]'), function (li) {
+      var page = Number(li.dataset.page);
+      if ((page === data.page && !current[li.dataset.id]) || page > data.pages) li.remove();
+    });
+    pagesLoaded = Math.max(1, Math.min(pagesLoaded, data.pages));
+    if (data.alerts.length) {
+      list.hidden = false;
+      var empty = document.getElementById('no-alerts');
+      if (empty) empty.remove();
+    }
+    loadMore.hidden = data.page >= data.pages;
+  }
+
+  function refresh() {
+    for (var p = 1; p <= pagesLoaded; p++) {
+      fetchPage(p).then(function (data) { if (data) applyPage(data); }).catch(function () {});
+    }
+  }
+
+  loadMore.addEventListener('click', function () {
+    fetchPage(pagesLoaded + 1).then(function (data) {
+      if (data) { pagesLoaded = data.page; applyPage(data); }
+    });
+  });
+
+  setInterval(function () { if (!document.hidden) refresh(); }, REFRESH_MS);
+  document.addEventListener('visibilitychange', function () { if (!document.hidden) refresh(); });
+})();